@@ -0,0 +1,218 @@
+"""
+album_art.py
+
+Content-addressed store for record covers. Every cover is saved once under
+the sha256 of its bytes, with the extension its magic bytes call for, and
+records point at it through manifest.json:
+
+    album_art/
+        objects/ab/ab12...ef.jpg
+        thumbs/128/ab12...ef.jpg
+        manifest.json
+
+The manifest maps every record to its cover and thumbnails, paths relative
+to the store, so other tools can show the art without the network. It also
+remembers the sha256 and ETag each cover url was last served with, so a
+cover shared by several records is fetched once and revalidated after.
+
+Thumbnails need Pillow, without it the store keeps the covers only.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ART_LOCATION = "./album_art/"
+# longest edge of every thumbnail kept next to a cover
+THUMBNAIL_SIZES = (64, 128, 320)
+
+_MAGIC = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+
+def sniff_extension(data: bytes) -> str:
+    """Returns the file extension for image data from its magic bytes."""
+    for magic, extension in _MAGIC:
+        if data.startswith(magic):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".bin"
+
+
+def write_atomically(path: str, data: bytes) -> None:
+    """Writes data to path so readers see the old file or the whole new one."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def make_thumbnails(source: str, targets: List[Tuple[int, str]]) -> List[str]:
+    """Writes a JPEG thumbnail of source for every (size, path) in targets.
+
+    Runs in a worker process. Returns the paths it wrote.
+    """
+    written = []
+    # largest first, each thumbnail is shrunk from the one before it
+    targets = sorted(targets, reverse=True)
+    with Image.open(source) as image:
+        # a JPEG is decoded straight at the smallest scale that still covers
+        # the largest thumbnail
+        image.draft("RGB", (targets[0][0], targets[0][0]))
+        image = image.convert("RGB")
+        for size, path in targets:
+            image.thumbnail((size, size))
+            tmp = f"{path}.{os.getpid()}.tmp"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image.save(tmp, "JPEG", quality=85)
+            os.replace(tmp, path)
+            written.append(path)
+    return written
+
+
+class ArtStore:
+    """Covers by content hash, records and urls mapped to them by a manifest.
+
+    fetch() is safe to call from several threads, the other methods belong
+    to the thread driving the sync.
+    """
+
+    def __init__(
+        self, root: str = ART_LOCATION, sizes: Iterable[int] = THUMBNAIL_SIZES
+    ):
+        self.root = root
+        self.sizes = tuple(sizes)
+        self.received = 0
+        self._lock = threading.Lock()
+        try:
+            with open(self._path("manifest.json"), "r") as manifest_json:
+                manifest = json.load(manifest_json)
+        except (OSError, ValueError):
+            manifest = {}
+        self._records: Dict[str, Dict] = manifest.get("records", {})
+        self._urls: Dict[str, Dict] = manifest.get("urls", {})
+
+    def cover(self, key: str) -> Optional[str]:
+        """Returns the path of the cover of record key, if it has one on disk."""
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        path = self._path(entry["art"])
+        return path if os.path.exists(path) else None
+
+    def put(self, data: bytes) -> str:
+        """Stores data under its hash unless it is already there, returns its path.
+
+        The path is relative to the store.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        relative = os.path.join("objects", digest[:2], digest + sniff_extension(data))
+        if not os.path.exists(self._path(relative)):
+            write_atomically(self._path(relative), data)
+        return relative
+
+    def fetch(self, session: requests.Session, url: str) -> Optional[str]:
+        """Makes sure the cover at url is stored, returns its relative path.
+
+        A url fetched before is revalidated with its ETag, a 304 costs no
+        bytes. Returns None if the cover could not be fetched.
+        """
+        with self._lock:
+            known = self._urls.get(url)
+        headers = {}
+        if known and known.get("etag") and os.path.exists(self._path(known["art"])):
+            headers["If-None-Match"] = known["etag"]
+        r = session.get(url, headers=headers, timeout=30)
+        if r.status_code == 304:
+            return known["art"]
+        if r.status_code != 200:
+            logging.warning(f"Cover {url} answered {r.status_code}")
+            return None
+        relative = self.put(r.content)
+        with self._lock:
+            self.received += len(r.content)
+            self._urls[url] = {"art": relative, "etag": r.headers.get("ETag")}
+        return relative
+
+    def link(self, key: str, name: str, url: str, relative: str) -> None:
+        """Points record key at the stored cover relative, fetched from url."""
+        digest = os.path.splitext(os.path.basename(relative))[0]
+        self._records[key] = {
+            "name": name,
+            "image_url": url,
+            "sha256": digest,
+            "art": relative,
+            # filled in by make_thumbnails()
+            "thumbnails": {},
+        }
+
+    def make_thumbnails(self, workers: Optional[int] = None) -> int:
+        """Writes the thumbnails that are missing, returns how many it wrote.
+
+        Resizing is CPU bound, so it runs on a pool of `workers` processes.
+        Every record's manifest entry lists the thumbnails on disk.
+        """
+        if Image is None:
+            logging.warning("Pillow is not installed, no thumbnails are made")
+            return 0
+        # covers shared by several records are resized once
+        missing: Dict[str, List[Tuple[int, str]]] = {}
+        for entry in self._records.values():
+            for size in self.sizes:
+                relative = os.path.join("thumbs", str(size), entry["sha256"] + ".jpg")
+                path = self._path(relative)
+                if os.path.exists(path):
+                    entry["thumbnails"][str(size)] = relative
+                    continue
+                targets = missing.setdefault(self._path(entry["art"]), [])
+                if (size, path) not in targets:
+                    targets.append((size, path))
+        if not missing:
+            return 0
+
+        written = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(make_thumbnails, source, targets): source
+                for source, targets in missing.items()
+            }
+            for future, source in futures.items():
+                try:
+                    written.extend(future.result())
+                except OSError as e:
+                    logging.warning(f"Unable to make thumbnails of {source}: {e}")
+        written_paths = set(written)
+        for entry in self._records.values():
+            for size in self.sizes:
+                relative = os.path.join("thumbs", str(size), entry["sha256"] + ".jpg")
+                if self._path(relative) in written_paths:
+                    entry["thumbnails"][str(size)] = relative
+        logging.info(f"Made {len(written)} thumbnails of {len(missing)} covers")
+        return len(written)
+
+    def save(self) -> None:
+        """Writes manifest.json."""
+        manifest = {"records": self._records, "urls": self._urls}
+        write_atomically(
+            self._path("manifest.json"), json.dumps(manifest, indent=4).encode()
+        )
+
+    def _path(self, relative: str) -> str:
+        return os.path.join(self.root, relative)
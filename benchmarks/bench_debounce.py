@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""Replays bouncing button traces through the old lockout and the debouncer.
+
+A trace is a pull-up button pressed --presses times at up to --rate
+presses per second, like a fast skip-skip-skip. Every press and release
+chatters for up to --bounce seconds, a few run longer, and the idle line
+picks up short glitches. Lockout is RPi.GPIO's bouncetime on falling
+edges, optionally with SimpleButton's antibouncehack; window is
+debounce.StableWindowDebouncer.
+
+Reports the share of real presses that got through, accepted presses per
+second, false triggers and the latency from the first edge of a press.
+
+    python benchmarks/bench_debounce.py --rate 8 --windows 0.001,0.005,0.01
+"""
+
+import argparse
+import os
+import random
+import sys
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from debounce import StableWindowDebouncer  # noqa: E402
+
+LOW, HIGH = 0, 1
+
+
+def chatter(trace: list, t: float, level: int, bounce: float) -> None:
+    """Appends a transition to level at t, bouncing back and forth first."""
+    end = t + random.uniform(0, bounce)
+    if random.random() < 0.05:
+        # now and then a worn contact bounces much longer
+        end = t + random.uniform(bounce, 3 * bounce)
+    while t < end:
+        trace.append((t, level))
+        t += random.uniform(0.00005, 0.002)
+        trace.append((t, 1 - level))
+        t += random.uniform(0.00005, 0.002)
+    trace.append((t, level))
+
+
+def make_trace(args) -> Tuple[List[Tuple[float, int]], List[Tuple[float, float]]]:
+    """Returns the (time, level) edges and the (start, end) of every press."""
+    random.seed(args.seed)
+    trace: List[Tuple[float, int]] = []
+    presses = []
+    t = 0.1
+    period = 1.0 / args.rate
+    for _ in range(args.presses):
+        down = random.uniform(0.35, 0.6) * period
+        start = t
+        chatter(trace, t, LOW, args.bounce)
+        chatter(trace, t + down, HIGH, args.bounce)
+        presses.append((start, t + down))
+        idle = random.uniform(0.4, 0.65) * period
+        # a glitch pulls the idle line low for well under a millisecond
+        if random.random() < args.glitches:
+            glitch = t + down + idle / 2
+            trace.extend(((glitch, LOW), (glitch + random.uniform(5e-5, 5e-4), HIGH)))
+        t += down + idle
+    trace.sort()
+    return trace, presses
+
+
+def level_at(trace: list, t: float) -> int:
+    level = HIGH
+    for edge_time, edge_level in trace:
+        if edge_time > t:
+            break
+        level = edge_level
+    return level
+
+
+def lockout(trace: list, bouncetime: float, antibouncehack: bool) -> List[float]:
+    """Press times RPi.GPIO reports for falling edges with a bouncetime."""
+    reported = []
+    last = float("-inf")
+    previous = HIGH
+    for t, level in trace:
+        falling = previous == HIGH and level == LOW
+        previous = level
+        if not falling or t - last < bouncetime:
+            continue
+        last = t
+        # the hack sleeps 100 ms in the callback and drops the press unless
+        # the pin is still low
+        if antibouncehack and level_at(trace, t + 0.1) != LOW:
+            continue
+        reported.append(t)
+    return reported
+
+
+def window(trace: list, seconds: float) -> List[float]:
+    """Press times the debouncer accepts, each when its window ran out."""
+    debouncer = StableWindowDebouncer(HIGH, seconds)
+    reported = []
+    due = None
+    for t, level in trace:
+        if due is not None and due <= t and debouncer.settle(due) == LOW:
+            reported.append(due)
+        due = debouncer.edge(level, t)
+    if due is not None and debouncer.settle(due) == LOW:
+        reported.append(due)
+    return reported
+
+
+def score(name: str, reported: List[float], presses: list) -> None:
+    accepted = 0
+    false = 0
+    latencies = []
+    i = 0
+    counted = set()
+    for t in reported:
+        while i + 1 < len(presses) and presses[i + 1][0] <= t:
+            i += 1
+        start, end = presses[i]
+        if start <= t <= end + 0.05 and i not in counted:
+            counted.add(i)
+            accepted += 1
+            latencies.append(t - start)
+        else:
+            false += 1
+    duration = presses[-1][1] - presses[0][0]
+    latencies.sort()
+    median = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+    print(
+        f"{name:22s} {accepted / len(presses):7.1%} of presses "
+        f"{accepted / duration:6.2f} presses/s {false:5d} false triggers "
+        f"latency median {median:5.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--presses", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=8.0)
+    parser.add_argument("--bounce", type=float, default=0.003)
+    parser.add_argument("--glitches", type=float, default=0.05)
+    parser.add_argument("--bouncetime", type=float, default=0.5)
+    parser.add_argument("--windows", default="0.001,0.005,0.01")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    trace, presses = make_trace(args)
+    print(f"{len(presses)} presses, {len(trace)} edges")
+    name = f"lockout {args.bouncetime * 1000:.0f} ms"
+    score(name, lockout(trace, args.bouncetime, False), presses)
+    score(f"{name} + hack", lockout(trace, args.bouncetime, True), presses)
+    for seconds in (float(w) for w in args.windows.split(",")):
+        score(f"window {seconds * 1000:g} ms", window(trace, seconds), presses)
+
+
+if __name__ == "__main__":
+    main()
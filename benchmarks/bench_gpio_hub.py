@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Drives a GpioHub on the simulated chip and measures edge dispatch.
+
+A feeder thread toggles --lines inputs, --edges edges in all, at up to
+--rate edges per second (0 for as fast as it can). Reports dispatched
+edges per second and the latency from each edge's timestamp to its
+handler, then spins a rotary encoder through the hub into RotaryDecoder
+and checks every detent arrives.
+
+    python benchmarks/bench_gpio_hub.py --lines 8 --edges 50000 --rate 20000
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gpio_hub import BOARD_TO_BCM, GpioHub, SimulatedChip  # noqa: E402
+from rotary_decoder import RotaryDecoder  # noqa: E402
+
+# pins used by the jukebox first: buttons, encoder, RFID IRQ
+PINS = [36, 13, 29, 31, 16, 37, 11, 18] + sorted(
+    set(BOARD_TO_BCM) - {36, 13, 29, 31, 16, 37, 11, 18}
+)
+
+
+def dispatch(lines: int, edges: int, rate: float) -> None:
+    chip = SimulatedChip()
+    hub = GpioHub(chip)
+    latencies = []
+    done = threading.Event()
+
+    def handler(edge) -> None:
+        latencies.append(time.monotonic() - edge.timestamp)
+        if len(latencies) == edges:
+            done.set()
+
+    pins = PINS[:lines]
+    for pin in pins:
+        hub.add_input(pin, handler)
+    hub.start()
+    start = time.perf_counter()
+    for i in range(edges):
+        if rate:
+            while time.perf_counter() < start + i / rate:
+                pass
+        pin = pins[i % lines]
+        chip.set_value(BOARD_TO_BCM[pin], (i // lines) % 2)
+    done.wait(10)
+    elapsed = time.perf_counter() - start
+    hub.close()
+    latencies.sort()
+    print(
+        f"{lines:2d} lines  {len(latencies) / elapsed:9.0f} edges/s dispatched  "
+        f"latency median {latencies[len(latencies) // 2] * 1e6:7.1f} us  "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:8.1f} us"
+    )
+
+
+def encoder(detents: int) -> None:
+    chip = SimulatedChip()
+    hub = GpioHub(chip)
+    steps = []
+    decoder = RotaryDecoder(on_incr=steps.append, on_decr=steps.append)
+    levels = {}
+
+    def handler(edge) -> None:
+        levels[edge.pin] = edge.level
+        decoder.push(levels[37] | (levels[11] << 1), edge.timestamp)
+
+    for pin in (37, 11):
+        hub.add_input(pin, handler)
+        levels[pin] = hub.value(pin)
+    hub.start()
+    a, b = BOARD_TO_BCM[37], BOARD_TO_BCM[11]
+    for _ in range(detents):
+        for level_a, level_b in ((0, 1), (0, 0), (1, 0), (1, 1)):
+            chip.set_value(a, level_a)
+            chip.set_value(b, level_b)
+        # about 2 kHz of detents, faster than any hand turns the knob
+        time.sleep(0.0005)
+    deadline = time.monotonic() + 5
+    while len(steps) < detents and time.monotonic() < deadline:
+        time.sleep(0.01)
+    hub.close()
+    decoder.stop()
+    print(
+        f"encoder  {len(steps)} of {detents} detents decoded through the hub, "
+        f"{decoder.buffer.dropped} edges dropped"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--edges", type=int, default=50000)
+    parser.add_argument("--rate", type=float, default=20000)
+    parser.add_argument("--detents", type=int, default=2000)
+    args = parser.parse_args()
+
+    for lines in sorted({1, args.lines}):
+        dispatch(lines, args.edges, args.rate)
+    dispatch(args.lines, args.edges, 0)
+    encoder(args.detents)
+
+
+if __name__ == "__main__":
+    main()
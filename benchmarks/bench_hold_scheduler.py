@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""Measures how long presses on other pins wait while one button is held.
+
+RPi.GPIO runs every pin's callback on one thread. This replays that with a
+queue of edges: button A is held for --hold seconds in --mode while button
+B is pressed every --interval seconds. Sleep loop is the old
+SimpleButton.longPressHandler, polling the pin in 0.1 s sleeps on the
+callback thread; scheduler is hold_scheduler.HoldDetector.
+
+    python benchmarks/bench_hold_scheduler.py --hold 2 --mode Repeat
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from hold_scheduler import HOLD_MODES, HoldDetector, HoldScheduler  # noqa: E402
+
+LOW, HIGH = 0, 1
+
+
+def check_stays_in_state(levels, hold_time, pin, state) -> bool:
+    """checkGpioStaysInState as SimpleButton had it."""
+    start = time.perf_counter()
+    while True:
+        time.sleep(0.1)
+        current = levels[pin]
+        if hold_time < time.perf_counter() - start:
+            break
+        if state != current:
+            return False
+    return state == current
+
+
+def sleep_loop(levels, mode, hold_time, on_press, on_hold):
+    """Returns a callback running the old longPressHandler."""
+
+    def stays() -> bool:
+        return check_stays_in_state(levels, hold_time, "A", LOW)
+
+    def handler() -> None:
+        if mode != "Postpone":
+            on_press()
+        if mode == "Repeat":
+            while stays():
+                on_press()
+        elif mode == "Postpone":
+            if stays():
+                on_press()
+            while stays():
+                pass
+        elif mode == "SecondFunc":
+            if stays():
+                on_hold()
+            while stays():
+                pass
+        elif mode == "SecondFuncRepeat":
+            while stays():
+                on_hold()
+
+    return handler
+
+
+def detector(levels, mode, hold_time, on_press, on_hold, scheduler):
+    hold = HoldDetector(
+        mode,
+        hold_time,
+        is_held=lambda: levels["A"] == LOW,
+        on_press=on_press,
+        on_hold=on_hold,
+        scheduler=scheduler,
+    )
+    return hold.pressed
+
+
+def run(make_handler, args) -> None:
+    levels = {"A": HIGH, "B": HIGH}
+    actions = {"press": 0, "hold": 0}
+    latencies = []
+    edges: queue.Queue = queue.Queue()
+
+    def count(kind):
+        def action(*_):
+            actions[kind] += 1
+
+        return action
+
+    hold_a = make_handler(
+        levels, args.mode, args.hold_time, count("press"), count("hold")
+    )
+
+    def callback_thread() -> None:
+        while True:
+            edge = edges.get()
+            if edge is None:
+                return
+            pin, pressed_at = edge
+            if pin == "A":
+                hold_a()
+            else:
+                latencies.append(time.perf_counter() - pressed_at)
+
+    thread = threading.Thread(target=callback_thread)
+    thread.start()
+    start = time.perf_counter()
+    levels["A"] = LOW
+    edges.put(("A", start))
+    presses = 0
+    while time.perf_counter() - start < args.hold:
+        time.sleep(args.interval)
+        # B goes down and back up, its callback only needs the edge
+        edges.put(("B", time.perf_counter()))
+        presses += 1
+    levels["A"] = HIGH
+    handled = len(latencies)
+    # let the last hold check see the release
+    time.sleep(args.hold_time + 0.2)
+    edges.put(None)
+    thread.join()
+    latencies.sort()
+    print(
+        f"  {presses} presses of B, {handled} handled while A was held, "
+        f"A made {actions['press']} press and {actions['hold']} hold actions"
+    )
+    if latencies:
+        print(
+            f"  B latency median {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+            f"max {latencies[-1] * 1000:.2f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hold", type=float, default=2.0)
+    parser.add_argument("--hold-time", type=float, default=0.3)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--mode", choices=HOLD_MODES, default="Repeat")
+    args = parser.parse_args()
+
+    print("sleep loop")
+    run(sleep_loop, args)
+
+    print("scheduler")
+    scheduler = HoldScheduler()
+    run(
+        lambda *handler_args: detector(*handler_args, scheduler=scheduler),
+        args,
+    )
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
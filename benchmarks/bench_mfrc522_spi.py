@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""Counts SPI transactions and time per read_id_no_block scan cycle.
+
+Runs the MFRC522 driver against mfrc522.fake_spidev.FakeSpiDev, so no reader
+needs to be attached, and fake_gpio stands in for RPi.GPIO and spidev off a
+Pi. Use --latency to model the cost of each spidev ioctl.
+
+    python benchmarks/bench_mfrc522_spi.py --cycles 200 --latency 0.0001
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fake_gpio  # noqa: E402
+
+fake_gpio.install()
+
+from mfrc522 import MFRC522, SimpleMFRC522  # noqa: E402
+from mfrc522.fake_spidev import FakeSpiDev  # noqa: E402
+
+
+def make_reader(spi: FakeSpiDev, shadow_registers: bool) -> SimpleMFRC522:
+    reader = SimpleMFRC522.__new__(SimpleMFRC522)
+    reader.READER = MFRC522(spi=spi, shadow_registers=shadow_registers)
+    return reader
+
+
+def run(uid, cycles: int, latency: float, shadow_registers: bool) -> None:
+    spi = FakeSpiDev(uid=uid, latency=latency)
+    reader = make_reader(spi, shadow_registers)
+    spi.reset_counters()
+    start = time.perf_counter()
+    for _ in range(cycles):
+        reader.read_id_no_block()
+    elapsed = time.perf_counter() - start
+    label = "tag present" if uid is not None else "no tag"
+    if shadow_registers:
+        label += " (shadow)"
+    print(
+        f"{label:21s} {spi.transactions / cycles:8.1f} xfers/scan "
+        f"{spi.bytes / cycles:8.1f} bytes/scan "
+        f"{elapsed / cycles * 1000:8.3f} ms/scan"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    for shadow_registers in (False, True):
+        run([0x8B, 0x2E, 0x1C, 0x5A], args.cycles, args.latency, shadow_registers)
+        run(None, args.cycles, args.latency, shadow_registers)
+
+
+if __name__ == "__main__":
+    main()
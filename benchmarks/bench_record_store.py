@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Compares the records.json catalogue with the SQLite record store.
+
+Builds synthetic catalogues of each --sizes and times loading the full
+index, looking one tag up, and saving one changed record. The JSON path is
+the one update_records and RecordCatalogue use for records.json. Lookups
+compare the catalogue's in-memory index with a point query on the store.
+
+    python benchmarks/bench_record_store.py --sizes 10000 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from record_store import RecordStore  # noqa: E402
+from records import build_index, compile_targets  # noqa: E402
+
+KINDS = ("album", "playlist", "track")
+
+
+def make_records(size: int) -> dict:
+    records = {}
+    for i in range(size):
+        kind = KINDS[i % len(KINDS)]
+        spotify_id = f"{i:022d}"
+        records[str(100000000000 + i)] = {
+            "url": f"https://open.spotify.com/{kind}/{spotify_id}",
+            "name": f"Record {i}",
+            "image_url": f"https://i.scdn.co/image/{spotify_id}",
+            "uri": f"spotify:{kind}:{spotify_id}",
+        }
+    return {"records": records}
+
+
+def timed(fn, repeat: int) -> float:
+    """Returns the median seconds fn takes over repeat runs."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def bench(size: int, lookups: int, directory: str) -> None:
+    document = make_records(size)
+    json_path = os.path.join(directory, f"records-{size}.json")
+    with open(json_path, "w") as outfile:
+        json.dump(document, outfile)
+    store = RecordStore(os.path.join(directory, f"records-{size}.db"))
+    store.upsert_many(document["records"])
+    uids = random.sample(list(document["records"]), lookups)
+
+    def load_json() -> dict:
+        with open(json_path, "r") as records_json:
+            return build_index(json.load(records_json))
+
+    def load_store() -> dict:
+        return compile_targets(store.play_rows())
+
+    index = load_json()
+
+    def lookup_index() -> None:
+        for uid in uids:
+            index.get(uid)
+
+    def lookup_store() -> None:
+        for uid in uids:
+            store.uri_for(uid)
+
+    changed = dict(document["records"][uids[0]], name="Renamed")
+
+    def save_json() -> None:
+        document["records"][uids[0]] = changed
+        with open(json_path + ".tmp", "w") as outfile:
+            json.dump(document, outfile)
+        os.replace(json_path + ".tmp", json_path)
+
+    def save_store() -> None:
+        store.upsert(uids[0], changed)
+
+    repeat = 5 if size <= 10000 else 3
+    rows = (
+        ("load index", timed(load_json, repeat), timed(load_store, repeat), 1),
+        (
+            "lookup",
+            timed(lookup_index, repeat),
+            timed(lookup_store, repeat),
+            lookups,
+        ),
+        ("save one record", timed(save_json, repeat), timed(save_store, repeat), 1),
+    )
+    print(f"{size} records")
+    for name, json_time, store_time, count in rows:
+        print(
+            f"  {name:16s} json {json_time / count * 1e6:12.1f} us"
+            f"   sqlite {store_time / count * 1e6:12.1f} us"
+        )
+    store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            bench(size, args.lookups, directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Compares tag-to-event latency of the UID-only and full-read scan modes.
+
+A tag is dropped onto mfrc522.fake_spidev.FakeSpiDev at a random moment and
+the time until RFIDReaderSession reports its arrival is recorded. --latency
+models the cost of each SPI transfer, --auth the time the tag takes to
+authenticate, which the fake otherwise answers instantly. Off a Pi,
+fake_gpio stands in for RPi.GPIO and spidev.
+
+    python benchmarks/bench_rfid_latency.py --trials 50 --latency 0.0002
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fake_gpio  # noqa: E402
+
+fake_gpio.install()
+
+from mfrc522 import MFRC522, SimpleMFRC522  # noqa: E402
+from mfrc522.fake_spidev import FakeSpiDev  # noqa: E402
+from read_rfid import SCAN_FULL, SCAN_UID, RFIDReaderSession  # noqa: E402
+
+
+class SlowAuthSpiDev(FakeSpiDev):
+    def __init__(self, auth=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.auth = auth
+
+    def _command(self, command):
+        if command == self.PCD_AUTHENT and self.auth:
+            time.sleep(self.auth)
+        super()._command(command)
+
+
+def trial(mode: str, latency: float, auth: float, poll_interval: float) -> float:
+    spi = SlowAuthSpiDev(auth=auth, latency=latency)
+    reader = SimpleMFRC522.__new__(SimpleMFRC522)
+    reader.READER = MFRC522(spi=spi)
+    reader.poll_interval = poll_interval
+    session = RFIDReaderSession(reader=reader, poll_interval=poll_interval, mode=mode)
+    placed = []
+
+    def place_tag() -> None:
+        time.sleep(random.uniform(0.05, 0.25))
+        placed.append(time.perf_counter())
+        spi.uid = [0x8B, 0x2E, 0x1C, 0x5A]
+
+    threading.Thread(target=place_tag).start()
+    session.wait_for_arrival()
+    return time.perf_counter() - placed[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0002)
+    parser.add_argument("--auth", type=float, default=0.005)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    args = parser.parse_args()
+    random.seed(1)
+    for mode in (SCAN_FULL, SCAN_UID):
+        samples = [
+            trial(mode, args.latency, args.auth, args.poll_interval) * 1000
+            for _ in range(args.trials)
+        ]
+        print(
+            f"{mode:5s} median {statistics.median(samples):7.2f} ms "
+            f"mean {statistics.mean(samples):7.2f} ms "
+            f"max {max(samples):7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+"""Replays A/B edge traces through the rotary encoder state table.
+
+Compares the ctypes Flags union RotaryEncoder used to decode with, formatting
+its debug strings on every edge, against rotary_decoder's plain ints, and
+the whole new path: push into an EdgeRingBuffer, decode on the worker.
+Then feeds a tenth of the trace at --rate edges per second into a default
+sized buffer to show what the callback pays and whether edges are dropped.
+The trace turns the knob back and forth, with contact bounce on some edges.
+
+    python benchmarks/bench_rotary_decoder.py --detents 100000
+"""
+
+import argparse
+import ctypes
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rotary_decoder import (  # noqa: E402
+    IDLE,
+    KEY_DECR,
+    KEY_INCR,
+    TABLE,
+    RotaryDecoder,
+    decode,
+)
+
+logger = logging.getLogger("rotary_encoder")
+
+# (A, B) after each edge of one detent, from the resting A=1, B=1
+INCR = ((0, 1), (0, 0), (1, 0), (1, 1))
+DECR = ((1, 0), (0, 0), (0, 1), (1, 1))
+
+
+class Flags_bits(ctypes.LittleEndianStructure):
+    _fields_ = [("A", ctypes.c_uint8, 1), ("B", ctypes.c_uint8, 1)]
+
+
+class Flags(ctypes.Union):
+    _anonymous_ = ("bit",)
+    _fields_ = [("bit", Flags_bits), ("asByte", ctypes.c_uint8)]
+
+
+def make_trace(detents: int, bounce: float) -> list:
+    """Returns (A, B) per edge, turning in runs of up to 20 detents."""
+    random.seed(1)
+    trace = []
+    while detents > 0:
+        run = min(random.randint(1, 20), detents)
+        detents -= run
+        sequence = random.choice((INCR, DECR))
+        for _ in range(run):
+            for i, levels in enumerate(sequence):
+                if i and random.random() < bounce:
+                    # the contact chatters back to the previous level once
+                    trace.extend((levels, sequence[i - 1]))
+                trace.append(levels)
+    return trace
+
+
+def ctypes_flags(trace: list) -> int:
+    """The decode loop RotaryEncoder._Callback ran before."""
+    state = Flags()
+    state.asByte = IDLE
+    steps = 0
+    for a, b in trace:
+        state.A = a
+        state.B = b
+        logger.debug(
+            'new encoderState: "{}" -> {}, {},{}'.format(
+                state.asByte, TABLE[state.asByte], a, b
+            )
+        )
+        state.asByte = TABLE[state.asByte]
+        if state.asByte == KEY_INCR or state.asByte == KEY_DECR:
+            steps += 1
+    return steps
+
+
+def plain_ints(trace: list) -> int:
+    state = IDLE
+    steps = 0
+    for a, b in trace:
+        state = decode(state, a | (b << 1))
+        if state == KEY_INCR or state == KEY_DECR:
+            steps += 1
+    return steps
+
+
+def ring_buffer(trace: list) -> int:
+    """Pushes every edge like the GPIO callback, then waits for the worker.
+
+    The buffer holds the whole trace, so this is the decode throughput of
+    the full path without drops.
+    """
+    steps = []
+    decoder = RotaryDecoder(
+        on_incr=steps.append, on_decr=steps.append, capacity=len(trace)
+    )
+    push = decoder.push
+    for a, b in trace:
+        push(a | (b << 1), time.monotonic())
+    while len(decoder.buffer):
+        time.sleep(0.001)
+    decoder.stop()
+    return len(steps)
+
+
+def paced(trace: list, rate: float) -> None:
+    """Feeds edges at rate per second into the default 1024 slot buffer."""
+    steps = []
+    decoder = RotaryDecoder(on_incr=steps.append, on_decr=steps.append)
+    interval = 1.0 / rate
+    push_time = 0.0
+    start = time.perf_counter()
+    for i, (a, b) in enumerate(trace):
+        while time.perf_counter() < start + i * interval:
+            pass
+        before = time.perf_counter()
+        decoder.push(a | (b << 1), time.monotonic())
+        push_time += time.perf_counter() - before
+    while len(decoder.buffer):
+        time.sleep(0.001)
+    decoder.stop()
+    print(
+        f"paced   {rate:12.0f} edges/s  {len(steps)} steps from {len(trace)} edges, "
+        f"{decoder.buffer.dropped} dropped, "
+        f"{push_time / len(trace) * 1e6:.2f} us per callback push"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detents", type=int, default=100000)
+    parser.add_argument("--bounce", type=float, default=0.05)
+    parser.add_argument("--rate", type=float, default=20000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    trace = make_trace(args.detents, args.bounce)
+    for name, replay in (
+        ("ctypes", ctypes_flags),
+        ("ints", plain_ints),
+        ("ring", ring_buffer),
+    ):
+        start = time.perf_counter()
+        steps = replay(trace)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:7s} {len(trace) / elapsed:12.0f} edges/s  "
+            f"{steps} steps from {len(trace)} edges"
+        )
+    paced(make_trace(args.detents // 10, args.bounce), args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""Compares the four-process runtime with the asyncio one.
+
+Starts jukebox_master.py in every --modes runtime and reports:
+- boot-to-ready: time until the jukebox, buttons, volume and RFID reader
+  have all logged that they are ready;
+- idle CPU: CPU use over the next --idle seconds with no input;
+- RSS and PSS: summed over every process of the runtime. PSS shares the
+  pages forked processes have in common between them.
+Then it stops the runtime with SIGINT. The environment is passed through,
+so the runtime is configured as usual, e.g. GPIO_HUB=simulated
+MIXER_BACKEND=fake off the Pi.
+
+    python benchmarks/bench_runtime.py --modes processes,async --idle 10
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+MASTER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "jukebox_master.py"
+)
+READY_MARKERS = (
+    "Jukebox ready in",
+    "Buttons ready",
+    "Volume ready",
+    "RFID reader ready",
+)
+TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def group_pids(pgid: int) -> List[int]:
+    """Returns the pids of every process in a process group."""
+    pids = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rindex(")") + 2 :].split()
+        if int(fields[2]) == pgid:
+            pids.append(int(name))
+    return pids
+
+
+def cpu_seconds(pids: List[int]) -> float:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rindex(")") + 2 :].split()
+        total += int(fields[11]) + int(fields[12])
+    return total / TICKS
+
+
+def memory_kb(pids: List[int]) -> Dict[str, int]:
+    totals = {"VmRSS": 0, "Pss": 0}
+    for pid in pids:
+        sources = (
+            (f"/proc/{pid}/status", "VmRSS"),
+            (f"/proc/{pid}/smaps_rollup", "Pss"),
+        )
+        for path, key in sources:
+            try:
+                with open(path) as f:
+                    for line in f:
+                        if line.startswith(key + ":"):
+                            totals[key] += int(line.split()[1])
+                            break
+            except OSError:
+                pass
+    return totals
+
+
+def measure(mode: str, args) -> None:
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, MASTER, "--runtime", mode],
+        cwd=args.cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        start_new_session=True,
+    )
+    seen = set()
+    ready = threading.Event()
+    ready_at = []
+
+    def read_log() -> None:
+        # keeps reading to the end, a full pipe would stall the runtime
+        for line in process.stdout:
+            for marker in READY_MARKERS:
+                if marker in line and marker not in seen:
+                    seen.add(marker)
+                    if len(seen) == len(READY_MARKERS):
+                        ready_at.append(time.monotonic())
+                        ready.set()
+
+    reader = threading.Thread(target=read_log)
+    reader.daemon = True
+    reader.start()
+    try:
+        if not ready.wait(args.timeout):
+            print(
+                f"{mode:10s} not ready after {args.timeout}s, missing "
+                f"{sorted(set(READY_MARKERS) - seen)}"
+            )
+            return
+        time.sleep(args.settle)
+        pids = group_pids(process.pid)
+        before = cpu_seconds(pids)
+        time.sleep(args.idle)
+        pids = group_pids(process.pid)
+        idle_cpu = (cpu_seconds(pids) - before) / args.idle
+        memory = memory_kb(pids)
+        print(
+            f"{mode:10s} {len(pids)} processes  "
+            f"boot-to-ready {ready_at[0] - started:6.2f} s  "
+            f"idle CPU {idle_cpu:6.2%}  "
+            f"RSS {memory['VmRSS'] / 1024:6.1f} MB  PSS {memory['Pss'] / 1024:6.1f} MB"
+        )
+    finally:
+        os.killpg(process.pid, signal.SIGINT)
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="processes,async")
+    parser.add_argument("--idle", type=float, default=10.0)
+    parser.add_argument("--settle", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--cwd", default=os.getcwd(), help="where records.json is")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        measure(mode, args)
+
+
+if __name__ == "__main__":
+    main()
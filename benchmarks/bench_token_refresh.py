@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Measures the latency of the first command after a token refresh.
+
+Compares building a new spotipy client on every refresh, as refresh_token
+used to, with rotating the token on one long-lived client. Runs against
+benchmarks/stub_spotify.py, whose --handshake delay models the TCP + TLS
+setup every new connection to api.spotify.com pays.
+
+    python benchmarks/bench_token_refresh.py --refreshes 20 --handshake 0.08
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import spotipy  # noqa: E402
+
+from stub_spotify import StubSpotifyServer  # noqa: E402
+
+
+def first_command(sp: spotipy.Spotify) -> float:
+    start = time.perf_counter()
+    sp.devices()
+    return time.perf_counter() - start
+
+
+def new_client_per_refresh(prefix: str, refreshes: int) -> list:
+    samples = []
+    for i in range(refreshes):
+        sp = spotipy.Spotify(auth=f"token-{i}")
+        sp.prefix = prefix
+        samples.append(first_command(sp))
+    return samples
+
+
+def rotate_token(prefix: str, refreshes: int) -> list:
+    sp = spotipy.Spotify(auth="token")
+    sp.prefix = prefix
+    sp.devices()
+    samples = []
+    for i in range(refreshes):
+        sp.set_auth(f"token-{i}")
+        samples.append(first_command(sp))
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refreshes", type=int, default=20)
+    parser.add_argument("--handshake", type=float, default=0.08)
+    args = parser.parse_args()
+    for label, run in (
+        ("new client per refresh", new_client_per_refresh),
+        ("rotate token on client", rotate_token),
+    ):
+        server = StubSpotifyServer(handshake_delay=args.handshake).start()
+        samples = [s * 1000 for s in run(server.prefix, args.refreshes)]
+        print(
+            f"{label}: first command median {statistics.median(samples):6.1f} ms "
+            f"max {max(samples):6.1f} ms, {server.connections} connections"
+        )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""Measures how long update_records takes to refresh a large catalogue.
+
+Compares the old record-by-record loop, one metadata call and one blocking
+cover download each, with update_records.refresh_records, which batches
+albums and tracks through the multi-id endpoints and fetches playlists and
+covers on a thread pool. Then syncs the same catalogue incrementally three
+times, cold, with nothing changed and with --full, sharing one sync cache.
+Runs against benchmarks/stub_spotify.py, whose tracks share album covers.
+With Pillow installed the covers are real JPEGs and thumbnails are made.
+
+    python benchmarks/bench_update_records.py --records 500 --latency 0.03
+"""
+
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import requests  # noqa: E402
+import spotipy  # noqa: E402
+
+from stub_spotify import StubSpotifyServer  # noqa: E402
+from album_art import Image, ArtStore  # noqa: E402
+from update_records import SyncCache, refresh_records  # noqa: E402
+
+KINDS = ("album", "track", "playlist", "album", "track")
+
+
+def make_records(count: int) -> dict:
+    records = {}
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        records[str(100000000000 + i)] = {
+            "url": f"https://open.spotify.com/{kind}/{i:022d}?si=0000000000000000"
+        }
+    return records
+
+
+def one_by_one(sp: spotipy.Spotify, records: dict, image_dir: str) -> None:
+    """The loop update_records.main() ran before batching."""
+    for item in records.values():
+        if "album" in item.get("url"):
+            details = sp.album(item.get("url"))
+            item["image_url"] = details["images"][0]["url"]
+        elif "playlist" in item.get("url"):
+            details = sp.playlist(item.get("url"))
+            item["image_url"] = details["images"][0]["url"]
+        else:
+            details = sp.track(item.get("url"))
+            item["image_url"] = details["album"]["images"][0]["url"]
+        item["name"] = details["name"]
+        item["uri"] = details["uri"]
+
+        r = requests.get(item["image_url"], stream=True)
+        if r.status_code == 200:
+            r.raw.decode_content = True
+            with open(os.path.join(image_dir, item["name"] + ".png"), "wb") as f:
+                shutil.copyfileobj(r.raw, f)
+
+
+def batched(sp: spotipy.Spotify, records: dict, image_dir: str) -> None:
+    refresh_records(sp, records, ArtStore(image_dir))
+
+
+def cover_image() -> bytes:
+    """A 640x640 JPEG cover if Pillow is around, else the stub's placeholder."""
+    if Image is None:
+        return b""
+    image = Image.new("RGB", (640, 640), (200, 80, 40))
+    data = io.BytesIO()
+    image.save(data, "JPEG")
+    return data.getvalue()
+
+
+def count_files(directory: str) -> int:
+    """Counts covers, leaving out thumbnails and the manifest."""
+    count = 0
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if name != "thumbs"]
+        count += len([name for name in files if name != "manifest.json"])
+    return count
+
+
+def start_server(args) -> StubSpotifyServer:
+    return StubSpotifyServer(
+        handshake_delay=args.handshake, latency=args.latency, image=cover_image()
+    ).start()
+
+
+def run(name: str, refresh, args) -> None:
+    server = start_server(args)
+    sp = spotipy.Spotify(auth="token")
+    sp.prefix = server.prefix
+    records = make_records(args.records)
+    with tempfile.TemporaryDirectory() as image_dir:
+        start = time.perf_counter()
+        refresh(sp, records, image_dir)
+        elapsed = time.perf_counter() - start
+        covers = count_files(image_dir)
+    server.shutdown()
+    print(
+        f"{name:10s} {elapsed:7.2f} s  {server.requests:5d} requests  "
+        f"{server.connections:4d} connections  {covers} covers"
+    )
+
+
+def incremental(args) -> None:
+    server = start_server(args)
+    sp = spotipy.Spotify(auth="token")
+    sp.prefix = server.prefix
+    records = make_records(args.records)
+    with tempfile.TemporaryDirectory() as image_dir:
+        cache = SyncCache(os.path.join(image_dir, "sync.json"))
+        for name, full in (("cold sync", False), ("no-op sync", False), ("full", True)):
+            requests_before, bytes_before = server.requests, server.image_bytes
+            start = time.perf_counter()
+            art = ArtStore(image_dir)
+            changed = refresh_records(sp, records, art, cache=cache, full=full)
+            elapsed = time.perf_counter() - start
+            cache.save()
+            print(
+                f"{name:10s} {elapsed:7.2f} s  "
+                f"{server.requests - requests_before:5d} requests  "
+                f"{server.image_bytes - bytes_before:9d} image bytes  "
+                f"{len(changed)} changed"
+            )
+    server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.03)
+    parser.add_argument("--handshake", type=float, default=0.05)
+    args = parser.parse_args()
+    run("one by one", one_by_one, args)
+    run("batched", batched, args)
+    incremental(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Measures knob-to-mixer latency while the volume knob is spun fast.
+
+Detents arrive every --interval seconds on one callback thread, as they do
+from RPi.GPIO. Inline calls the mixer from the callback, like VolumeControl
+used to, applier hands each value to mixer.VolumeApplier. The mixer takes
+--latency seconds per write, about what an amixer spawn costs on a Pi Zero.
+
+    python benchmarks/bench_volume_latency.py --detents 60 --interval 0.004
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mixer import FakeMixer, VolumeApplier  # noqa: E402
+
+
+class TimedMixer(FakeMixer):
+    def __init__(self, latency: float):
+        super().__init__(latency)
+        self.times = []
+
+    def set_volume(self, vol: int) -> None:
+        super().set_volume(vol)
+        self.times.append(time.monotonic())
+
+
+def spin(handle, detents: int, interval: float) -> float:
+    """Feeds detents to handle on a callback thread, returns the last one's time."""
+    events: queue.Queue = queue.Queue()
+
+    def callback_thread() -> None:
+        while True:
+            vol = events.get()
+            if vol is None:
+                return
+            handle(vol)
+
+    thread = threading.Thread(target=callback_thread)
+    thread.start()
+    start = time.monotonic()
+    for i in range(detents):
+        delay = start + i * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        events.put(15 + i)
+    last_detent = time.monotonic()
+    events.put(None)
+    thread.join()
+    return last_detent
+
+
+def report(name: str, mixer: TimedMixer, last_detent: float, final: int) -> None:
+    assert mixer.volume == final, (mixer.volume, final)
+    print(
+        f"{name:8s} {len(mixer.volumes):3d} writes, final volume on the mixer "
+        f"{(mixer.times[-1] - last_detent) * 1000:7.1f} ms after the last detent"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--detents", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=0.004)
+    parser.add_argument("--latency", type=float, default=0.025)
+    parser.add_argument("--max-rate", type=float, default=25.0)
+    args = parser.parse_args()
+    final = 15 + args.detents - 1
+
+    mixer = TimedMixer(args.latency)
+    last_detent = spin(mixer.set_volume, args.detents, args.interval)
+    report("inline", mixer, last_detent, final)
+
+    mixer = TimedMixer(args.latency)
+    applier = VolumeApplier(mixer, max_rate=args.max_rate)
+    last_detent = spin(applier.set, args.detents, args.interval)
+    applier.wait_applied()
+    report("applier", mixer, last_detent, final)
+    latencies = sorted(applier.latencies)
+    print(
+        f"         set() to write: median {latencies[len(latencies) // 2] * 1000:.1f}"
+        f" ms, max {latencies[-1] * 1000:.1f} ms"
+    )
+    applier.close()
+
+
+if __name__ == "__main__":
+    main()
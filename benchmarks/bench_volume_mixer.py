@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Measures how many volume changes per second each mixer backend manages.
+
+Every backend gets --updates changes. Without a sound card, or without
+amixer at all, pass --stand-in to run the amixer backends against a script
+that swallows its commands, which still pays for every process spawn.
+
+    python benchmarks/bench_volume_mixer.py --updates 200
+    python benchmarks/bench_volume_mixer.py --stand-in
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mixer import BACKENDS, alsaaudio  # noqa: E402
+
+STAND_IN = """#!/bin/sh
+# amixer stand-in: -s reads commands until stdin closes, anything else exits
+for arg in "$@"; do
+    [ "$arg" = "-s" ] && exec cat > /dev/null
+done
+exit 0
+"""
+
+
+def make_stand_in(directory: str) -> str:
+    path = os.path.join(directory, "amixer")
+    with open(path, "w") as f:
+        f.write(STAND_IN)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def bench(name: str, mixer, updates: int) -> None:
+    start = time.perf_counter()
+    for i in range(updates):
+        mixer.set_volume(15 + i % 50)
+    # a pipe only counts once amixer has read everything
+    mixer.close()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:6s} {updates / elapsed:10.0f} updates/s "
+        f"{elapsed / updates * 1000:8.3f} ms each"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--stand-in", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.stand_in or shutil.which("amixer") is None:
+            amixer = make_stand_in(directory)
+            print(f"amixer stand-in at {amixer}")
+        else:
+            amixer = "amixer"
+        bench("shell", BACKENDS["shell"](amixer=amixer), args.updates)
+        bench("amixer", BACKENDS["amixer"](amixer=amixer), args.updates)
+        if alsaaudio is not None and not args.stand_in:
+            bench("alsa", BACKENDS["alsa"](), args.updates)
+        bench("fake", BACKENDS["fake"](), args.updates)
+
+
+if __name__ == "__main__":
+    main()
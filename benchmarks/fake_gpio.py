@@ -0,0 +1,67 @@
+"""Stand-ins for RPi.GPIO and spidev, so the reader benchmarks run off a Pi.
+
+mfrc522 and read_rfid import both at module level. install() registers a
+fake for whichever of them cannot be imported, before those imports run.
+The benchmarks hand the driver a mfrc522.fake_spidev.FakeSpiDev, so the
+fake spidev is never opened, and no IRQ pin is set up on the fake GPIO.
+"""
+
+import importlib
+import sys
+import types
+
+BOARD = 10
+BCM = 11
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+
+def _gpio() -> types.ModuleType:
+    gpio = types.ModuleType("RPi.GPIO")
+    mode = []
+    for name, value in globals().items():
+        if name.isupper():
+            setattr(gpio, name, value)
+    gpio.getmode = lambda: mode[-1] if mode else None
+    gpio.setmode = mode.append
+    gpio.setwarnings = lambda flag: None
+    gpio.setup = lambda *args, **kwargs: None
+    gpio.output = lambda *args, **kwargs: None
+    gpio.input = lambda pin: HIGH
+    gpio.cleanup = lambda *args: None
+    gpio.add_event_detect = lambda *args, **kwargs: None
+    gpio.remove_event_detect = lambda *args, **kwargs: None
+    gpio.wait_for_edge = lambda *args, **kwargs: None
+    return gpio
+
+
+class _SpiDev:
+    def open(self, bus: int, device: int) -> None:
+        raise OSError("no SPI bus, pass a mfrc522.fake_spidev.FakeSpiDev")
+
+
+def install() -> None:
+    """Registers the fakes for RPi.GPIO and spidev where they are missing."""
+    try:
+        importlib.import_module("RPi.GPIO")
+    except (ImportError, RuntimeError):
+        # RPi.GPIO raises RuntimeError when imported on something not a Pi
+        gpio = _gpio()
+        rpi = types.ModuleType("RPi")
+        rpi.GPIO = gpio
+        sys.modules["RPi"] = rpi
+        sys.modules["RPi.GPIO"] = gpio
+    try:
+        importlib.import_module("spidev")
+    except ImportError:
+        spidev = types.ModuleType("spidev")
+        spidev.SpiDev = _SpiDev
+        sys.modules["spidev"] = spidev
@@ -0,0 +1,134 @@
+"""A local stand-in for the Spotify Web API, used by the benchmarks.
+
+Serves just enough of /v1 for the jukebox and update_records, plus cover
+images under /image/, which honour If-None-Match. Albums, playlists and
+tracks exist for any id asked for. `handshake_delay` is slept once for
+every new connection, to model the TCP + TLS setup a fresh connection to
+api.spotify.com costs, and `latency` is added to every request.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body in one segment, like a real server would
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        time.sleep(self.server.handshake_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if url.path == "/v1/me/player/devices":
+            self._json(
+                {"devices": [{"id": "stub", "name": "Kid_Jukebox", "is_active": True}]}
+            )
+        elif url.path.startswith("/v1/me/player"):
+            self._send(204, b"")
+        elif parts[:1] == ["image"] and len(parts) == 2:
+            etag = f'"{parts[1]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, b"", headers={"ETag": etag})
+                return
+            # every cover differs, trailing bytes do not upset a decoder
+            body = self.server.image + parts[1].encode()
+            self.server.image_bytes += len(body)
+            self._send(200, body, "image/jpeg", {"ETag": etag})
+        elif parts[:1] == ["v1"] and len(parts) == 2 and parts[1] in self.KINDS:
+            # multi-id endpoint, /v1/albums?ids=a,b
+            ids = parse_qs(url.query).get("ids", [""])[0].split(",")
+            kind = self.KINDS[parts[1]]
+            self._json({parts[1]: [self._object(kind, id) for id in ids]})
+        elif parts[:1] == ["v1"] and len(parts) == 3 and parts[1] in self.KINDS:
+            self._json(self._object(self.KINDS[parts[1]], parts[2]))
+        else:
+            self._send(404, b"")
+
+    KINDS = {"albums": "album", "playlists": "playlist", "tracks": "track"}
+
+    def _object(self, kind, id):
+        images = [{"url": f"{self.server.base}/image/{id}"}]
+        body = {"id": id, "name": f"{kind.title()} {id}", "uri": f"spotify:{kind}:{id}"}
+        if kind == "track":
+            # tracks share their album's cover, a hundred ids to an album
+            album_cover = f"{self.server.base}/image/album{id[:-2]}"
+            body["album"] = {"images": [{"url": album_cover}]}
+        else:
+            body["images"] = images
+        if kind == "playlist":
+            body["snapshot_id"] = f"snapshot-{id}"
+        return body
+
+    def _json(self, body):
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+    def _send(self, status, body, content_type=None, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        handshake_delay: float = 0.0,
+        latency: float = 0.0,
+        image_size: int = 64 * 1024,
+        image: bytes = b"",
+    ):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.handshake_delay = handshake_delay
+        self.latency = latency
+        # image replaces the placeholder, e.g. a real JPEG to make thumbnails of
+        self.image = image or b"\xff\xd8\xff\xe0" + bytes(image_size - 4)
+        self.connections = 0
+        self.requests = 0
+        self.image_bytes = 0
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def prefix(self) -> str:
+        """Drop-in value for spotipy.Spotify.prefix."""
+        return self.base + "/v1/"
+
+    def start(self) -> "StubSpotifyServer":
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
@@ -0,0 +1,150 @@
+"""
+command_planner.py
+
+Turns an FSM_jukebox transition into the fewest Spotify Web API calls that
+reach the target state. Calls that do not depend on each other are grouped
+so they can be sent concurrently.
+"""
+
+from concurrent.futures import Executor
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+import spotipy
+
+from records import PlayTarget
+
+STOPPED = "stopped"
+PLAYING = "playing"
+PAUSED = "paused"
+
+# An RFID tag arrives as play/pause with a uri, it is planned separately
+TAG = "tag"
+
+
+class Call(NamedTuple):
+    method: str  # name of the spotipy.Spotify method
+    kwargs: Dict[str, Any]
+
+
+class Plan(NamedTuple):
+    # groups run one after the other, the calls inside a group concurrently
+    groups: Tuple[Tuple[Call, ...], ...]
+    target: str
+    # whether the jukebox is the active device once the calls are sent,
+    # None when the plan cannot tell and the state has to be fetched again
+    active: Optional[bool] = None
+
+    @property
+    def call_count(self) -> int:
+        return sum(len(group) for group in self.groups)
+
+
+# Web API calls each transition costs, as (jukebox active, jukebox inactive).
+# Only a tag or randomize reach Spotify when another device is playing.
+EXPECTED_CALLS = {
+    (STOPPED, TAG): (1, 1),
+    (STOPPED, "play/pause"): (0, 0),
+    (STOPPED, "stop"): (0, 0),
+    (STOPPED, "forward"): (0, 0),
+    (STOPPED, "reverse"): (0, 0),
+    (STOPPED, "randomize"): (1, 1),
+    (PLAYING, TAG): (1, 1),
+    (PLAYING, "play/pause"): (1, 0),
+    (PLAYING, "stop"): (1, 0),
+    (PLAYING, "forward"): (1, 0),
+    (PLAYING, "reverse"): (1, 0),
+    (PLAYING, "randomize"): (1, 1),
+    (PAUSED, TAG): (1, 1),
+    (PAUSED, "play/pause"): (1, 0),
+    (PAUSED, "stop"): (1, 0),
+    (PAUSED, "forward"): (2, 0),
+    (PAUSED, "reverse"): (2, 0),
+    (PAUSED, "randomize"): (1, 1),
+}
+
+_SKIPS = {"forward": "next_track", "reverse": "previous_track"}
+
+def plan(
+    state: str,
+    command: str,
+    argument: Union[str, PlayTarget] = "",
+    device_id: Optional[str] = None,
+    active: bool = True,
+    shuffle: bool = True,
+) -> Plan:
+    """Plans the calls that take the jukebox from state through command.
+
+    Parameter state: current FSM state, one of STOPPED, PLAYING or PAUSED.
+    Parameter argument: the PlayTarget (or bare uri) for a play/pause sent by
+        a tag, the number of tracks for a forward or reverse burst, else "".
+        A bare uri that is not playable raises ValueError.
+    Parameter active: whether the jukebox is the active Spotify device.
+    Parameter shuffle: the current shuffle status, randomize flips it.
+    """
+    device = {"device_id": device_id}
+
+    if command == "play/pause" and argument != "":
+        # a tag always takes over playback, whichever device was active
+        if not isinstance(argument, PlayTarget):
+            argument = PlayTarget(argument)
+        call = Call("start_playback", {**device, **argument.play_kwargs()})
+        # start_playback is what makes the jukebox the active device
+        return Plan(((call,),), PLAYING, active=True)
+
+    if command == "randomize":
+        # shuffle goes out when another device plays too and leaves that
+        # device active, so the active state is left for the mirror to fetch
+        return Plan(((Call("shuffle", {**device, "state": not shuffle}),),), state)
+
+    if state == STOPPED:
+        return Plan((), STOPPED)
+
+    if command == "stop":
+        # paused is only what the mirror believes, a stop press pauses
+        # anyway so a stale belief never leaves music playing
+        if active:
+            return Plan(((Call("pause_playback", device),),), STOPPED, active=True)
+        return Plan((), STOPPED)
+
+    if command == "play/pause":
+        if state == PLAYING:
+            if active:
+                return Plan(((Call("pause_playback", device),),), PAUSED, active=True)
+            return Plan((), PAUSED)
+        if active:
+            return Plan(((Call("start_playback", device),),), PLAYING, active=True)
+        return Plan((), PAUSED)
+
+    if command in _SKIPS:
+        if not active:
+            return Plan((), state)
+        skip = Call(_SKIPS[command], device)
+        # skips of a burst must land one after the other
+        skips = ((skip,),) * (int(argument or 1) - 1)
+        if state == PLAYING:
+            return Plan(((skip,),) + skips, PLAYING, active=True)
+        # the Web API does not order player commands sent together, so the
+        # skip waits for the resume
+        return Plan(
+            ((Call("start_playback", device),), (skip,)) + skips, PLAYING, active=True
+        )
+
+    raise ValueError(f'"{command}" is not a planned command')
+
+
+def execute(plan: Plan, sp: spotipy.client.Spotify, executor: Executor) -> None:
+    """Sends the calls of plan through sp, groups of several via executor."""
+    for group in plan.groups:
+        if len(group) == 1:
+            call = group[0]
+            getattr(sp, call.method)(**call.kwargs)
+            continue
+        futures = [
+            executor.submit(getattr(sp, call.method), **call.kwargs) for call in group
+        ]
+        # wait for every call before raising, so none is left in flight
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
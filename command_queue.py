@@ -0,0 +1,227 @@
+"""
+command_queue.py
+
+Helpers for the queue between the input processes and FSM_jukebox. Inputs
+are stamped when they happen, the consumer drains whatever is waiting and
+coalesces it before anything reaches Spotify.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+Command = Tuple[str, str]
+Stamped = Tuple[Command, float]
+
+SKIPS = ("forward", "reverse")
+
+# What InputEnqueuer does with a command that finds the queue full
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+COALESCE = "coalesce"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+
+def stamp(command: Command) -> Stamped:
+    """Pairs command with the moment the input happened."""
+    return (command, time.monotonic())
+
+
+def drain(messages, timeout: Optional[float] = None) -> List[Stamped]:
+    """Waits for one message, then takes everything else already queued."""
+    try:
+        batch = [messages.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    while True:
+        try:
+            batch.append(messages.get_nowait())
+        except queue.Empty:
+            return batch
+
+
+def coalesce(batch: List[Stamped]) -> List[Stamped]:
+    """Collapses a batch of commands into the ones worth sending.
+
+    Back to back tags keep only the last one, back to back skips in the same
+    direction become one burst ("forward", "3"), back to back play/pause
+    presses cancel out in pairs, and a stop discards the skips queued before
+    it. A merged command keeps the earliest input time it stands for.
+    """
+    result: List[Stamped] = []
+    for command, stamped_at in batch:
+        name, argument = command
+        last = result[-1][0] if result else None
+
+        if name == "stop":
+            result = [item for item in result if item[0][0] not in SKIPS]
+            if result and result[-1][0][0] == "stop":
+                continue
+        elif last is not None and last[0] == name:
+            if name == "play/pause" and argument != "" and last[1] != "":
+                result[-1] = (command, result[-1][1])
+                continue
+            if name == "play/pause" and argument == "" and last[1] == "":
+                result.pop()
+                continue
+            if name in SKIPS:
+                count = int(last[1] or 1) + int(argument or 1)
+                result[-1] = ((name, str(count)), result[-1][1])
+                continue
+        result.append((command, stamped_at))
+    return result
+
+
+class LatencyStats:
+    """Collects input to API times and logs a summary every `every` commands.
+
+    The consumer adds the size of each drained batch to `received`, so the
+    summary also shows how many inputs were coalesced away.
+    """
+
+    def __init__(self, every: int = 20):
+        self.every = every
+        self.received = 0
+        self._samples: List[Tuple[float, float]] = []
+
+    def add(self, to_send: float, to_done: float) -> None:
+        """
+        Parameter to_send: seconds from the input until its call was sent.
+        Parameter to_done: seconds from the input until the call returned.
+        """
+        self._samples.append((to_send, to_done))
+        if len(self._samples) >= self.every:
+            self.report()
+
+    def report(self) -> None:
+        if not self._samples:
+            return
+        to_send = [sample[0] * 1000 for sample in self._samples]
+        to_done = [sample[1] * 1000 for sample in self._samples]
+        logging.info(
+            f"Input to API over {len(self._samples)} commands "
+            + f"({self.received} inputs): "
+            + f"send mean {sum(to_send) / len(to_send):.0f} ms "
+            + f"max {max(to_send):.0f} ms, "
+            + f"done mean {sum(to_done) / len(to_done):.0f} ms "
+            + f"max {max(to_done):.0f} ms"
+        )
+        self._samples = []
+        self.received = 0
+
+
+class InputEnqueuer:
+    """Puts commands on the queue without ever blocking the caller.
+
+    Meant for GPIO callbacks, which share one thread for every pin. When the
+    queue is full the overflow policy decides: DROP_NEWEST discards the new
+    command, DROP_OLDEST discards the oldest queued one to make room, and
+    COALESCE keeps a local backlog, coalesced like the consumer would, that
+    a daemon thread hands over as soon as the queue has room again.
+
+    DROP_OLDEST takes the oldest command off the shared queue, whichever
+    process put it there, so a button press can evict a tag the RFID
+    reader queued, and it races the consumer's drain() for that command.
+    COALESCE only ever drops from its own backlog.
+    """
+
+    def __init__(self, messages, policy: str = COALESCE, retry_interval: float = 0.1):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy}")
+        self.messages = messages
+        self.policy = policy
+        self.retry_interval = retry_interval
+        self.enqueued = 0
+        self.overflows = 0
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._backlog: List[Stamped] = []
+        self._pending = threading.Event()
+        # the head of the backlog is being put on the queue, it stays in the
+        # backlog until the put succeeds and nothing coalesces into it
+        self._in_flight = False
+        if self.policy == COALESCE:
+            thread = threading.Thread(target=self._flush)
+            thread.daemon = True
+            thread.start()
+
+    def put(self, command: Command) -> bool:
+        """Stamps and queues command, returns False if it was dropped."""
+        item = stamp(command)
+        with self._lock:
+            if self._backlog:
+                # keep the order, newer commands go behind the backlog
+                self._hold(item)
+                return True
+            try:
+                self.messages.put_nowait(item)
+                self.enqueued += 1
+                return True
+            except queue.Full:
+                self.overflows += 1
+            logging.warning(f"Command queue full ({self.policy}): {self.stats()}")
+
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            if self.policy == DROP_OLDEST:
+                try:
+                    self.messages.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                try:
+                    self.messages.put_nowait(item)
+                    self.enqueued += 1
+                    return True
+                except queue.Full:
+                    self.dropped += 1
+                    return False
+            self._hold(item)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "enqueued": self.enqueued,
+            "overflows": self.overflows,
+            "dropped": self.dropped,
+            "backlog": len(self._backlog),
+        }
+
+    def _hold(self, item: Stamped) -> None:
+        held = len(self._backlog) + 1
+        if self._in_flight:
+            head, rest = self._backlog[:1], self._backlog[1:]
+            self._backlog = head + coalesce(rest + [item])
+        else:
+            self._backlog = coalesce(self._backlog + [item])
+        self.dropped += held - len(self._backlog)
+        self._pending.set()
+
+    def _flush(self) -> None:
+        while True:
+            self._pending.wait()
+            with self._lock:
+                if not self._backlog:
+                    self._pending.clear()
+                    continue
+                item = self._backlog[0]
+                self._in_flight = True
+            try:
+                self.messages.put(item, timeout=self.retry_interval)
+            except queue.Full:
+                # the head may merge with what came in meanwhile before the
+                # next try
+                with self._lock:
+                    self._in_flight = False
+                    held = len(self._backlog)
+                    self._backlog = coalesce(self._backlog)
+                    self.dropped += held - len(self._backlog)
+                continue
+            with self._lock:
+                self._backlog.pop(0)
+                self._in_flight = False
+                self.enqueued += 1
@@ -0,0 +1,131 @@
+"""
+debounce.py
+
+Software debouncing for SimpleButton. Instead of RPi.GPIO's bouncetime,
+which ignores every edge for half a second after a press, a level only
+counts once the pin has stayed at it for a short stable window. Bounce
+shorter than the window never gets through and the next real press is
+seen as soon as the switch settles, so repeated presses are limited by the
+switch, not a lockout.
+
+StableWindowDebouncer is the GPIO-free logic, DebouncedInput drives it from
+edge callbacks with the timers of hold_scheduler.
+"""
+
+import logging
+import threading
+from typing import Callable, Optional
+
+from hold_scheduler import HoldScheduler, Timer, default_scheduler
+
+logger = logging.getLogger(__name__)
+
+# seconds a level has to hold before it counts, longer than the bounce of
+# the tact switches on the box and far shorter than a press
+DEBOUNCE_WINDOW = 0.005
+
+
+class StableWindowDebouncer:
+    """Accepts a raw level once it has held for `window` seconds.
+
+    Feed it every raw level with edge(), and call settle() when the time
+    edge() returned comes, or before the next edge when replaying a trace.
+    """
+
+    def __init__(self, level: int, window: float = DEBOUNCE_WINDOW):
+        self.window = window
+        self.level = level  # the accepted level
+        self._raw = level
+        self._since = float("-inf")
+
+    def edge(self, level: int, timestamp: float) -> Optional[float]:
+        """Records the raw level after an edge.
+
+        Returns when the level will be accepted if it holds, None if it is
+        the accepted level already.
+        """
+        self._raw = level
+        self._since = timestamp
+        return self.due
+
+    @property
+    def due(self) -> Optional[float]:
+        """When the raw level will be accepted, None if it is accepted already."""
+        if self._raw == self.level:
+            return None
+        return self._since + self.window
+
+    def settle(self, now: float, level: Optional[int] = None) -> Optional[int]:
+        """Returns the new accepted level if the raw one has held long enough.
+
+        Parameter level: the pin read again at now, if there is one. A level
+            other than the raw one means an edge went missing, it is taken as
+            an edge at now and nothing is accepted yet.
+        """
+        if level is not None and level != self._raw:
+            self.edge(level, now)
+            return None
+        # the same sum edge() returned, so a timer run on time always settles
+        if self._raw == self.level or now < self._since + self.window:
+            return None
+        self.level = self._raw
+        return self.level
+
+
+class DebouncedInput:
+    """Calls on_change with every accepted level of one pin.
+
+    Parameter read_level: returns the pin's level, read on every edge.
+    Parameter on_change: called on the scheduler's thread with the level.
+    """
+
+    def __init__(
+        self,
+        read_level: Callable[[], int],
+        on_change: Callable[[int], None],
+        window: float = DEBOUNCE_WINDOW,
+        scheduler: Optional[HoldScheduler] = None,
+        name: Optional[str] = None,
+    ):
+        self.read_level = read_level
+        self.on_change = on_change
+        self.scheduler = scheduler or default_scheduler()
+        self.name = name
+        self.debouncer = StableWindowDebouncer(read_level(), window)
+        self._lock = threading.Lock()
+        self._timer: Optional[Timer] = None
+
+    @property
+    def level(self) -> int:
+        return self.debouncer.level
+
+    def edge(self, *args) -> None:
+        """GPIO callback, reads the level and returns without waiting."""
+        self.update(self.read_level())
+
+    def update(self, level: int) -> None:
+        """Takes the level after an edge from a source that reports it."""
+        with self._lock:
+            self.debouncer.edge(level, self.scheduler.clock())
+            self._schedule()
+
+    def _schedule(self) -> None:
+        # called with the lock held
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        due = self.debouncer.due
+        if due is not None:
+            self._timer = self.scheduler.call_at(due, self._settle)
+
+    def _settle(self) -> None:
+        with self._lock:
+            self._timer = None
+            # the pin must still agree when the window ends, an edge lost on
+            # the way would otherwise leave the wrong level accepted
+            level = self.debouncer.settle(self.scheduler.clock(), self.read_level())
+            if level is None:
+                self._schedule()
+        if level is not None:
+            logger.debug(f"{self.name}: level {level}")
+            self.on_change(level)
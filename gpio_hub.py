@@ -0,0 +1,355 @@
+"""
+gpio_hub.py
+
+One epoll loop for every GPIO input of the box. Buttons, the volume encoder
+and the RC522 IRQ line each register a handler for their pin, the hub
+requests the lines from the gpio character device and dispatches every
+edge with its kernel timestamp, instead of RPi.GPIO running a callback
+thread per add_event_detect.
+
+Backends:
+
+    GpiodChip      a /dev/gpiochip through the libgpiod v1 Python bindings
+    SimulatedChip  lines fed from set_value() over pipes, for boxes without
+                   a Pi and for benchmarks
+
+Pins are BOARD numbers like everywhere else in the jukebox, BOARD_TO_BCM
+turns them into the line offsets of the Pi's header chip.
+"""
+
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional
+
+try:
+    import gpiod
+except ImportError:
+    gpiod = None
+
+logger = logging.getLogger(__name__)
+
+GPIO_CHIP = os.environ.get("GPIO_CHIP", "gpiochip0")
+
+# 40 pin header BOARD numbers of the GPIO pins and their BCM line offsets
+BOARD_TO_BCM = {
+    3: 2,
+    5: 3,
+    7: 4,
+    8: 14,
+    10: 15,
+    11: 17,
+    12: 18,
+    13: 27,
+    15: 22,
+    16: 23,
+    18: 24,
+    19: 10,
+    21: 9,
+    22: 25,
+    23: 11,
+    24: 8,
+    26: 7,
+    27: 0,
+    28: 1,
+    29: 5,
+    31: 6,
+    32: 12,
+    33: 13,
+    35: 19,
+    36: 16,
+    37: 26,
+    38: 20,
+    40: 21,
+}
+
+EDGE_RISING = "rising"
+EDGE_FALLING = "falling"
+EDGE_BOTH = "both"
+PULL_UP = "pull_up"
+PULL_DOWN = "pull_down"
+PULL_OFF = "pull_off"
+
+# level is the line's level after the edge, timestamp is in seconds on the
+# time.monotonic() clock
+Edge = namedtuple("Edge", ("pin", "level", "timestamp"))
+
+
+class GpiodChip:
+    """Lines of a gpio character device, through libgpiod v1.
+
+    Every line is requested for both edges, the kernel timestamps them as
+    they happen, so the time an edge waited in the queue does not count.
+    """
+
+    def __init__(self, chip: str = GPIO_CHIP, consumer: str = "jukebox"):
+        if gpiod is None:
+            raise RuntimeError("the gpiod package is not installed")
+        self.chip = gpiod.Chip(chip)
+        self.consumer = consumer
+        self._lines: Dict[int, "gpiod.Line"] = {}
+        # kernels before 5.7 stamp events with the wall clock
+        self._realtime: Optional[bool] = None
+
+    def request(self, offset: int, pull: str) -> int:
+        """Requests a line for edge events, returns the fd that signals them."""
+        flags = {
+            PULL_UP: gpiod.LINE_REQ_FLAG_BIAS_PULL_UP,
+            PULL_DOWN: gpiod.LINE_REQ_FLAG_BIAS_PULL_DOWN,
+            PULL_OFF: gpiod.LINE_REQ_FLAG_BIAS_DISABLE,
+        }[pull]
+        line = self.chip.get_line(offset)
+        line.request(
+            consumer=self.consumer, type=gpiod.LINE_REQ_EV_BOTH_EDGES, flags=flags
+        )
+        self._lines[offset] = line
+        return line.event_get_fd()
+
+    def release(self, offset: int) -> None:
+        self._lines.pop(offset).release()
+
+    def get_value(self, offset: int) -> int:
+        return self._lines[offset].get_value()
+
+    def read_events(self, offset: int) -> List:
+        """Returns the (level, timestamp) of every queued edge of a line."""
+        line = self._lines[offset]
+        events = line.event_read_multiple()
+        return [
+            (
+                1 if event.type == gpiod.LineEvent.RISING_EDGE else 0,
+                self._monotonic(event.sec + event.nsec / 1e9),
+            )
+            for event in events
+        ]
+
+    def close(self) -> None:
+        for line in self._lines.values():
+            line.release()
+        self._lines.clear()
+        self.chip.close()
+
+    def _monotonic(self, timestamp: float) -> float:
+        if self._realtime is None:
+            self._realtime = abs(timestamp - time.time()) < abs(
+                timestamp - time.monotonic()
+            )
+        if self._realtime:
+            return timestamp - time.time() + time.monotonic()
+        return timestamp
+
+
+class SimulatedChip:
+    """Lines that change when set_value() says so, each one over a pipe.
+
+    Levels start at what the pull gives, 1 for pull_up, 0 otherwise.
+    """
+
+    _EVENT = struct.Struct("<Bd")
+
+    def __init__(self):
+        self._values: Dict[int, int] = {}
+        self._pipes: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def request(self, offset: int, pull: str) -> int:
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        with self._lock:
+            self._values[offset] = 1 if pull == PULL_UP else 0
+            self._pipes[offset] = (read_fd, write_fd)
+        return read_fd
+
+    def release(self, offset: int) -> None:
+        with self._lock:
+            read_fd, write_fd = self._pipes.pop(offset)
+        os.close(read_fd)
+        os.close(write_fd)
+
+    def get_value(self, offset: int) -> int:
+        return self._values[offset]
+
+    def set_value(
+        self, offset: int, level: int, timestamp: Optional[float] = None
+    ) -> None:
+        """Drives a line, an edge is queued only if its level changes."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            if self._values[offset] == level:
+                return
+            self._values[offset] = level
+            os.write(self._pipes[offset][1], self._EVENT.pack(level, timestamp))
+
+    def read_events(self, offset: int) -> List:
+        read_fd = self._pipes[offset][0]
+        try:
+            data = os.read(read_fd, self._EVENT.size * 64)
+        except BlockingIOError:
+            return []
+        return list(self._EVENT.iter_unpack(data))
+
+    def close(self) -> None:
+        for offset in list(self._pipes):
+            self.release(offset)
+
+
+def open_chip(simulated: bool = False):
+    """Returns the Pi's header chip, or a SimulatedChip."""
+    if simulated:
+        return SimulatedChip()
+    return GpiodChip()
+
+
+class GpioHub:
+    """Watches every registered input through one epoll and dispatches edges.
+
+    Handlers run on the thread driving the hub, start() gives it its own,
+    and get an Edge. Like GPIO callbacks they should return quickly.
+    dispatch() and fileno() let an event loop drive the hub instead.
+    """
+
+    def __init__(self, chip=None, name: str = "GpioHub"):
+        self.chip = chip if chip is not None else open_chip()
+        self.name = name
+        self._epoll = select.epoll()
+        self._lock = threading.Lock()
+        # fd -> (pin, offset), pin -> [(edge, handler)]
+        self._fds: Dict[int, tuple] = {}
+        self._handlers: Dict[int, List] = {}
+        self._offsets: Dict[int, int] = {}
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self._epoll.register(self._wake_read, select.EPOLLIN)
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def setup(self, pin: int, pull: str = PULL_UP) -> None:
+        """Requests the line of BOARD pin, so its value() can be read.
+
+        A pin already set up keeps the pull it was requested with.
+        """
+        if pin not in BOARD_TO_BCM:
+            raise ValueError(f"Board pin {pin} is not a GPIO")
+        with self._lock:
+            if pin in self._handlers:
+                return
+            offset = BOARD_TO_BCM[pin]
+            fd = self.chip.request(offset, pull)
+            self._fds[fd] = (pin, offset)
+            self._offsets[pin] = offset
+            self._handlers[pin] = []
+            self._epoll.register(fd, select.EPOLLIN | select.EPOLLPRI)
+
+    def add_input(
+        self,
+        pin: int,
+        handler: Callable[[Edge], None],
+        edge: str = EDGE_BOTH,
+        pull: str = PULL_UP,
+    ) -> None:
+        """Calls handler with every `edge` of BOARD pin, setting it up first.
+
+        Several handlers may share a pin.
+        """
+        self.setup(pin, pull)
+        with self._lock:
+            self._handlers[pin].append((edge, handler))
+
+    def remove_input(self, pin: int) -> None:
+        """Drops every handler of pin and releases its line."""
+        with self._lock:
+            if self._handlers.pop(pin, None) is None:
+                return
+            offset = self._offsets.pop(pin)
+            fd = next(fd for fd, (p, _) in self._fds.items() if p == pin)
+            del self._fds[fd]
+            self._epoll.unregister(fd)
+            self.chip.release(offset)
+
+    def value(self, pin: int) -> int:
+        """Returns the level of a registered pin."""
+        return self.chip.get_value(self._offsets[pin])
+
+    def fileno(self) -> int:
+        """The epoll fd, readable whenever an edge waits to be dispatched."""
+        return self._epoll.fileno()
+
+    def dispatch(self, timeout: Optional[float] = 0) -> int:
+        """Dispatches the edges that are waiting, returns how many.
+
+        Parameter timeout: seconds to wait for the first edge, None blocks.
+        """
+        ready = self._epoll.poll(-1 if timeout is None else timeout)
+        pending = []
+        for fd, _ in ready:
+            if fd == self._wake_read:
+                try:
+                    os.read(self._wake_read, 64)
+                except BlockingIOError:
+                    pass
+                continue
+            # under the lock, so remove_input() cannot release the line
+            # between the lookup and the read
+            with self._lock:
+                entry = self._fds.get(fd)
+                if entry is None:
+                    continue
+                pin, offset = entry
+                handlers = list(self._handlers[pin])
+                try:
+                    events = self.chip.read_events(offset)
+                except OSError as e:
+                    logger.warning(f"{self.name}: unable to read pin {pin}: {e}")
+                    continue
+            for level, timestamp in events:
+                pending.append((Edge(pin, level, timestamp), handlers))
+        # every line queues its own edges, the timestamps restore the order
+        # they happened in across lines, which the encoder depends on
+        pending.sort(key=lambda item: item[0].timestamp)
+        for event, handlers in pending:
+            for edge, handler in handlers:
+                if edge == EDGE_BOTH or (edge == EDGE_RISING) == bool(event.level):
+                    try:
+                        handler(event)
+                    except Exception:
+                        logger.exception(f"{self.name}: handler of {event.pin} failed")
+        return len(pending)
+
+    def run(self) -> None:
+        """Dispatches edges until stop()."""
+        while not self._stopped:
+            try:
+                self.dispatch(timeout=None)
+            except Exception:
+                # losing the thread would silently stop every input
+                logger.exception(f"{self.name}: dispatch failed")
+
+    def start(self) -> "GpioHub":
+        self._thread = threading.Thread(target=self.run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped = True
+        os.write(self._wake_write, b"\0")
+        if self._thread is not None:
+            self._thread.join(1.0)
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            for fd in list(self._fds):
+                self._epoll.unregister(fd)
+            self._fds.clear()
+            self._handlers.clear()
+            self._offsets.clear()
+        self.chip.close()
+        self._epoll.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
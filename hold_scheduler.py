@@ -0,0 +1,211 @@
+"""
+hold_scheduler.py
+
+GPIO-free long-press detection for SimpleButton. A press starts a timer
+instead of a sleep loop, so the RPi.GPIO callback thread, which every pin
+shares, returns straight away. One HoldScheduler thread runs the timers of
+all buttons from a heap and checks the pin level when each one is due:
+
+    Repeat            action on press, again every hold_time while held
+    Postpone          action once, after hold_time held
+    SecondFunc        action on press, action2 once after hold_time held
+    SecondFuncRepeat  action on press, action2 every hold_time while held
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HOLD_MODES = ("Repeat", "Postpone", "SecondFunc", "SecondFuncRepeat")
+
+
+class Timer:
+    """A call due at `when` on the scheduler's clock, see HoldScheduler.call_at."""
+
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, callback: Callable, args: Tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class HoldScheduler:
+    """Runs timers on one daemon thread, in deadline order.
+
+    Cancelled timers stay in the heap until they come up and are skipped,
+    so cancel() is O(1). The callbacks share the thread, they should be as
+    quick as a GPIO callback.
+    """
+
+    def __init__(self, name: str = "HoldScheduler", clock=time.monotonic):
+        self.name = name
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Timer]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def call_at(self, when: float, callback: Callable, *args) -> Timer:
+        timer = Timer(when, callback, args)
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._counter), timer))
+            # only a new earliest deadline changes how long the thread sleeps
+            if self._heap[0][2] is timer:
+                self._cond.notify()
+        return timer
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(1.0)
+
+    def _next_due(self) -> Optional[Timer]:
+        """Waits for the earliest timer to come due, None once stopped."""
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                when, _, timer = self._heap[0]
+                if timer.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                delay = when - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                return timer
+            return None
+
+    def _run(self) -> None:
+        while True:
+            timer = self._next_due()
+            if timer is None:
+                return
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                logger.exception(f"{self.name}: timer callback failed")
+
+
+_default_scheduler: Optional[HoldScheduler] = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> HoldScheduler:
+    """Returns the scheduler shared by every button of the process."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = HoldScheduler()
+        return _default_scheduler
+
+
+class HoldDetector:
+    """Runs one button's hold_mode from its press edges and timers.
+
+    Parameter is_held: returns whether the button is still down, it is read
+        when each hold_time runs out, not polled.
+    Parameter on_press: the button's action.
+    Parameter on_hold: the button's second action.
+    Parameter sample_interval: for pins whose release edges are not
+        reported, is_held is also read this often during a hold, and a
+        release seen ends it. Without it only the reading at each hold_time
+        counts, so a release and a press that goes unreported, e.g. inside
+        RPi.GPIO's bouncetime, before then still fire the hold.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        hold_time: float,
+        is_held: Callable[[], bool],
+        on_press: Callable,
+        on_hold: Callable,
+        scheduler: Optional[HoldScheduler] = None,
+        name: Optional[str] = None,
+        sample_interval: Optional[float] = None,
+    ):
+        if mode not in HOLD_MODES:
+            raise ValueError(f"Unknown hold mode {mode}")
+        self.mode = mode
+        self.hold_time = hold_time
+        self.is_held = is_held
+        self.on_press = on_press
+        self.on_hold = on_hold
+        self.scheduler = scheduler or default_scheduler()
+        self.name = name
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._timer: Optional[Timer] = None
+        # bumped by every press and release, a due timer of an older hold
+        # that raced with them is ignored
+        self._hold = 0
+
+    def pressed(self, *args) -> None:
+        """Handles a press edge, returns without waiting for the hold."""
+        with self._lock:
+            # a new press starts the hold over
+            if self._timer is not None:
+                self._timer.cancel()
+            self._hold += 1
+            deadline = self.scheduler.clock() + self.hold_time
+            self._timer = self._schedule(self._hold, args, deadline)
+        if self.mode != "Postpone":
+            self.on_press(*args)
+
+    def released(self) -> None:
+        """Handles a release edge, if the pin reports them, ending the hold early."""
+        with self._lock:
+            self._hold += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _schedule(self, hold: int, args: Tuple, deadline: float) -> Timer:
+        # called with the lock held
+        when = deadline
+        if self.sample_interval is not None:
+            when = min(deadline, self.scheduler.clock() + self.sample_interval)
+        return self.scheduler.call_at(when, self._due, hold, args, deadline)
+
+    def _due(self, hold: int, args: Tuple, deadline: float) -> None:
+        with self._lock:
+            timer = self._timer
+            if hold != self._hold or timer is None:
+                return
+            if not self.is_held():
+                self._timer = None
+                return
+            if timer.when < deadline:
+                # a sample on the way to the deadline, still held
+                self._timer = self._schedule(hold, args, deadline)
+                return
+            repeat = self.mode in ("Repeat", "SecondFuncRepeat")
+            # repeats keep to the press's rhythm however late this one ran
+            self._timer = None
+            if repeat:
+                self._timer = self._schedule(hold, args, deadline + self.hold_time)
+        logger.debug(f"{self.name}: held for {self.mode}")
+        if self.mode in ("Repeat", "Postpone"):
+            self.on_press(*args)
+        else:
+            self.on_hold(*args)
@@ -11,19 +11,27 @@ from pprint import pprint
 from typing import Tuple, List, Union, Optional, Generator, Dict
 
 import spotipy
-import spotipy.util as util
 from dotenv import load_dotenv
-from spotipy.oauth2 import SpotifyOAuth
+from spotipy.oauth2 import SpotifyOauthError
 import os
-import json
+import random
 import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import command_planner
+from playback_state import JUKEBOX_NAME, PlaybackStateMirror, find_device
+from records import PlayTarget, RecordCatalogue
+from spotify_auth import SpotifyAuth
 
 # Initialize
 load_dotenv()
-CLIENT_ID = os.environ.get("CLIENT_ID")
-CLIENT_SECRET = os.environ.get("CLIENT_SECRET")
 SPOTIFY_USERNAME = os.environ.get("SPOTIFY_USERNAME")
-REDIRECT_URI = "http://127.0.0.1:7070"
+
+# refresh this many seconds before the token expires, and retry failed
+# refreshes after a jittered backoff that doubles up to the cap
+REFRESH_MARGIN = 5 * 60
+RETRY_BACKOFF = 5
+RETRY_BACKOFF_CAP = 5 * 60
 
 
 logging.basicConfig(
@@ -39,62 +47,14 @@ spot_logger.setLevel(logging.WARNING)
 
 def spotipy_instance(
     username: str,
-) -> List[Union[spotipy.client.Spotify, SpotifyOAuth, Dict]]:
+) -> List[Union[spotipy.client.Spotify, spotipy.oauth2.SpotifyOAuth, Dict]]:
     """Returns a 'spotipy.Spotify' instance. Will request authenication at Redirect URL if not logged in before.
     Parameter username: integer found in Spotify profile
     Note, token expires after 60 minutes. Recommend refreshing more often than hourly.
+    Kept for older callers, new code should hold on to a spotify_auth.SpotifyAuth.
     """
-    scope = (
-        "user-read-playback-state,user-modify-playback-state,playlist-read-private,"
-        + "playlist-read-collaborative,user-read-currently-playing,user-read-private,"
-        + "user-library-read,user-read-playback-position"
-    )
-    try:
-        token = util.prompt_for_user_token(
-            username=username,
-            scope=scope,
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET,
-            redirect_uri=REDIRECT_URI,
-        )
-        sp_auth = SpotifyOAuth(
-            scope=scope,
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET,
-            redirect_uri=REDIRECT_URI,
-        )
-        sp = spotipy.Spotify(
-            auth=token,
-            client_credentials_manager=sp_auth,
-        )
-        cached_token = spotipy.oauth2.SpotifyOAuth(
-            username=username,
-            scope=scope,
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET,
-            redirect_uri=REDIRECT_URI,
-        ).get_cached_token()
-        logging.debug(f"Token successfully created/refreshed for {username}.")
-        logging.debug(f"full auth token: {cached_token}")
-    except Exception as e:
-        logging.exception(msg=f"Can't get token for {username}.\n{e}")
-    return [sp, sp_auth, cached_token]
-
-
-def refresh_token(
-    sp_auth: SpotifyOAuth, sp: spotipy.client.Spotify, whole_token: Dict
-) -> Dict:
-    """Refreshes the spotify OAuth token.
-    Parameter sp_auth: SpotifyOAuth object with username and all details included (e.g. scope)
-    Parameter sp: spotipy.Spotify, state will be modified and returned.
-    Parameter whole_token: Doct, token return by spotify api. Updated and saved at end.
-    """
-    logging.info("Refreshing spotify token...\n")
-    logging.debug(f"Cached access token info: {whole_token}")
-    token_info = sp_auth.refresh_access_token(whole_token["refresh_token"])
-    token = token_info["access_token"]
-    sp = spotipy.Spotify(auth=token)
-    return token_info, sp
+    auth = SpotifyAuth(username=username)
+    return [auth.client(), auth.oauth, auth.token_info]
 
 
 def get_jukebox_id(sp: spotipy.client.Spotify) -> str:
@@ -102,15 +62,11 @@ def get_jukebox_id(sp: spotipy.client.Spotify) -> str:
     Parameter sp: spotify client
     """
     result = sp.devices()
-    rest = result.get("devices")
-    box_id = ""
-    for device in rest:
-        if device["name"] == "Kid_Jukebox":
-            box_id = device["id"]
-            break
-    if box_id == "":
+    device = find_device(result.get("devices"), JUKEBOX_NAME)
+    if device is None:
         logging.error(f"Jukebox Id not found. Aborting...")
         os._exit(1)
+    box_id = device["id"]
     logging.debug(f"Jukebox Id={box_id}")
     return box_id
 
@@ -132,133 +88,151 @@ class FSM_jukebox:
 
         self.current_state = self.stopped
 
+        boot_started = time.monotonic()
         self.username = SPOTIFY_USERNAME
-        self.sp, self.sp_auth, self.token = spotipy_instance(username=self.username)
-        self.device_id = get_jukebox_id(self.sp)
-        self.records = self._load_records()
+        # the token is read from the cache once, the client and the refresh
+        # thread share it through self.auth
+        self.auth = SpotifyAuth(username=self.username)
+        self.sp = self.auth.client()
+        self.sp_auth = self.auth.oauth
+        auth_done = time.monotonic()
+        # device lookups are answered from memory, the mirror polls in the
+        # background and is told about every write we make
+        self.playback = PlaybackStateMirror(client=lambda: self.sp)
+        if self.playback.device_id is None:
+            logging.error(f"Jukebox Id not found. Aborting...")
+            os._exit(1)
+        self.playback.start()
+        devices_done = time.monotonic()
+        # records.json is watched, edits apply without a restart
+        self.records = RecordCatalogue()
+        self.records.start()
 
         self._repeat_status = True
         self.sp.repeat(state="context", device_id=self.device_id)
         self._shuffle_status = True
         self.sp.shuffle(state=True, device_id=self.device_id)
 
-        self._lock = threading.Lock()
+        # runs the calls a plan allows to go out concurrently
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
         self._refresh_thread = threading.Thread(target=self._refresh)
         self._refresh_thread.daemon = True
         self._refresh_thread.start()
 
+        ready = time.monotonic()
+        self.boot_timings = {
+            "auth": auth_done - boot_started,
+            "devices": devices_done - auth_done,
+            "setup": ready - devices_done,
+            "total": ready - boot_started,
+        }
+        logging.info(
+            "Jukebox ready in {total:.3f}s (auth {auth:.3f}s, devices {devices:.3f}s, "
+            "setup {setup:.3f}s)".format(**self.boot_timings)
+        )
+
     def _refresh(self) -> None:
-        """A function running in a separate daemon thread which will refresh spotify credentials"""
-        interval = 5 * 60  # testing every 5 minutes to keep connection alive
+        """A function running in a separate daemon thread which will refresh spotify credentials.
+        Refreshes REFRESH_MARGIN seconds before the token expires. The new token is
+        set on the client in a single assignment, commands never wait for a refresh.
+        """
+        failures = 0
+        delay = self._refresh_delay(failures)
         while True:
+            time.sleep(delay)
             try:
-                logging.debug("Locking FSM for refresh")
-                with self._lock:
-                    self.token, self.sp = refresh_token(
-                        self.sp_auth, self.sp, self.token
-                    )
-                # Make sure jukebox did not change id
-                self.device_id = get_jukebox_id(self.sp)
-                logging.debug("Refresh completed, unlocking FSM")
-                time.sleep(interval)
-            except socket.error:
-                logging.debug(
-                    "There was a socket error. Refresh unable to be completed. Retrying in 1 minute..."
+                self.auth.refresh()
+                failures = 0
+                delay = self._refresh_delay(failures)
+                logging.debug(f"Refresh completed, next one in {delay:.0f}s")
+            except (socket.error, SpotifyOauthError) as e:
+                failures += 1
+                delay = self._refresh_delay(failures)
+                logging.warning(
+                    f"Refresh unable to be completed ({e}). Retrying in {delay:.0f}s..."
                 )
-                time.sleep(60)
+
+    def _refresh_delay(self, failures: int) -> float:
+        """Seconds until the next refresh attempt after failures failed ones."""
+        if failures > 0:
+            backoff = min(RETRY_BACKOFF * 2 ** (failures - 1), RETRY_BACKOFF_CAP)
+            return random.uniform(backoff / 2, backoff)
+        return max(0.0, self.auth.expires_at - time.time() - REFRESH_MARGIN)
+
+    @property
+    def device_id(self) -> str:
+        return self.playback.device_id
 
     def send(self, command: Tuple[str, ...]) -> None:
         assert len(command) == 2
         if command[1] != "" and command[0] == "play/pause":
-            fixed_command = (
-                command[0],
-                self.records["records"].get(command[1]).get("uri"),
-            )
-            self.current_state.send(fixed_command)
+            target = self.records.lookup(command[1])
+            if target is None:
+                # unknown tags leave the state and Spotify alone
+                logging.info(f"Tag {command[1]} is not in the records, ignoring")
+                return
+            self.current_state.send(target.command)
         else:
             self.current_state.send(command)
 
+    def _run(self, command: str, argument: Union[str, PlayTarget] = "") -> None:
+        """Plans command from the current state and sends the planned calls."""
+        plan = command_planner.plan(
+            state=repr(self),
+            command=command,
+            argument=argument,
+            device_id=self.device_id,
+            active=self._active_device(),
+            shuffle=self._shuffle_status,
+        )
+        logging.debug(f"{command} in {self}: {plan}")
+        command_planner.execute(plan, self.sp, self._executor)
+        if plan.call_count > 0:
+            # the plan knows whether its calls leave the jukebox active, a
+            # shuffle sent while another device plays does not
+            self.playback.invalidate(active=plan.active)
+        self.current_state = getattr(self, plan.target)
+
     def _shuffle(self):
         """Randomize, i.e. shuffle. Update internal shuffle tracking variable."""
-        if self._shuffle_status == True:
-            self.sp.shuffle(state=False, device_id=self.device_id)
-            self._shuffle_status = False
-        else:
-            self.sp.shuffle(state=True, device_id=self.device_id)
-            self._shuffle_status = True
+        self._run("randomize")
+        self._shuffle_status = not self._shuffle_status
         logging.info(
             f"Shuffle Triggered in {self.current_state}. "
             + f"Now shuffle is set to {self._shuffle_status}."
         )
 
-    def _reverse(self):
-        """Skip back a track and start playing if not currently playing."""
-        if self._active_device() == True:
-            logging.debug(f"Rewinding Track, current state {self.current_state}")
-            if self.current_state == self.playing:
-                self.sp.previous_track(device_id=self.device_id)
-            else:
-                self._resume()
-                self.sp.previous_track(device_id=self.device_id)
-            self.current_state = self.playing
-        else:
-            pass
-
-    def _forward(self):
-        """Skip forward a track and start playing if not currently playing."""
-        if self._active_device() == True:
-            logging.debug(
-                f"Skipping Forward a Track, current state {self.current_state}"
-            )
-            if self.current_state == self.playing:
-                self.sp.next_track(device_id=self.device_id)
-            else:
-                self._resume()
-                self.sp.next_track(device_id=self.device_id)
-            self.current_state = self.playing
-        else:
-            pass
+    def _reverse(self, count: str = ""):
+        """Skip back count tracks (default 1) and start playing if not currently playing."""
+        logging.debug(f"Rewinding Track, current state {self.current_state}")
+        self._run("reverse", count)
+
+    def _forward(self, count: str = ""):
+        """Skip forward count tracks (default 1) and start playing if not currently playing."""
+        logging.debug(f"Skipping Forward a Track, current state {self.current_state}")
+        self._run("forward", count)
 
     def _resume(self) -> None:
         """Resumes playing current track."""
-        if self._active_device() == True:
-            self.sp.start_playback(device_id=self.device_id)
-            self.current_state = self.playing
+        self._run("play/pause")
 
     def _stop(self) -> None:
         """Stops playing current track, moves to stopped state."""
-        if self._active_device() == True:
-            self.sp.pause_playback(device_id=self.device_id)
-        self.current_state = self.stopped
+        self._run("stop")
 
-    def _play(self, uri: str) -> None:
-        """Starts playback of uri on jukebox."""
-        if "spotify:track:" in uri:
-            self.sp.start_playback(device_id=self.device_id, uris=[uri])
-            self.current_state = self.playing
-        else:
-            self.sp.start_playback(device_id=self.device_id, context_uri=uri)
-            self.current_state = self.playing
+    def _play(self, target: PlayTarget) -> None:
+        """Starts playback of target on jukebox, its payload is prebuilt."""
+        logging.info(f"Playing {target.name or target.uri}")
+        self._run("play/pause", target)
 
     def _pause(self) -> None:
         """Pauses playback on jukebox."""
-        if self._active_device() == True:
-            self.sp.pause_playback(device_id=self.device_id)
-        self.current_state = self.paused
+        self._run("play/pause")
 
     def _active_device(self):
         """Returns True if self.device_id (jukebox) matches the active device_id."""
-        devices_dict = self.sp.devices()
-        for device in devices_dict.get("devices"):
-            if device.get("is_active") == True and device.get("id") == self.device_id:
-                return True
-        return False
-
-    def _load_records(self) -> dict:
-        """Load the records.json into python dict."""
-        records_json = open("./records.json", "r")
-        logging.info("Loaded records.json")
-        return json.load(records_json)
+        return self.playback.is_jukebox_active()
 
     @staticmethod
     def _mapping_dict() -> Dict[str, str]:
@@ -318,10 +292,10 @@ class FSM_jukebox:
                 self._stop()
             elif command[0].lower() == "forward":
                 # Skipping Forward skips to next track
-                self._forward()
+                self._forward(command[1])
             elif command[0].lower() == "reverse":
                 # Skipping Reverse skips back to previous track
-                self._reverse()
+                self._reverse(command[1])
             elif command[0].lower() == "randomize":
                 # toggles shuffling status, stays paused
                 self._shuffle()
@@ -336,17 +310,17 @@ class FSM_jukebox:
                 if command[1] != "":
                     # actually call the function to play the song
                     self._play(command[1])
-                elif self._active_device() == True:
+                else:
                     # Pressing play while paused resumes the song if this device is being used
                     self._resume()
             elif command[0].lower() == "stop":
                 self._stop()
             elif command[0].lower() == "forward":
                 # Skipping Forward while paused starts playback and skips to next track
-                self._forward()
+                self._forward(command[1])
             elif command[0].lower() == "reverse":
                 # Skipping Reverse while paused starts playback and skips back to previous track
-                self._reverse()
+                self._reverse(command[1])
             elif command[0].lower() == "randomize":
                 # toggles shuffling status, stays paused
                 self._shuffle()
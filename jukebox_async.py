@@ -0,0 +1,206 @@
+#!/usr/bin/python
+"""
+jukebox_async.py
+
+Single-process runtime for the jukebox. Instead of jukebox_master's four
+processes, the RFID reader, the buttons, the volume knob and the Spotify
+dispatcher are tasks on one asyncio loop. Blocking work, the SPI scans and
+the Spotify calls, runs on a small thread pool, so nothing is imported
+twice and commands are passed as tuples, not pickled through a
+multiprocessing.Queue.
+
+With GPIO_HUB set, the loop watches the gpio_hub.GpioHub's epoll fd
+itself and button and encoder edges are dispatched on the loop thread.
+Without it the pins keep their RPi.GPIO callbacks, which hand commands to
+the loop thread-safely.
+
+    python jukebox_master.py --runtime async
+    JUKEBOX_RUNTIME=async python jukebox_master.py
+"""
+
+import asyncio
+import functools
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Dict, List, Optional
+
+from command_queue import Command, LatencyStats, Stamped, coalesce, stamp
+from gpio_hub import GpioHub, open_chip
+from jukebox_inputs import GPIO_HUB, RFID_IRQ_PIN, configure_logging, make_buttons
+from read_rfid import RFIDReaderSession
+from volume_control import VolumeControl
+
+logger = logging.getLogger(__name__)
+
+# one thread each for Spotify calls and RFID scans, one for start-up work
+EXECUTOR_WORKERS = 3
+
+
+class LoopEnqueuer:
+    """Hands commands to the loop's queue from any thread, never blocking.
+
+    Stands in for command_queue.InputEnqueuer. The queue is unbounded, the
+    dispatcher coalesces whatever is waiting before each send, so there is
+    no overflow to handle.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, messages: asyncio.Queue):
+        self.loop = loop
+        self.messages = messages
+        self.enqueued = 0
+
+    def put(self, command: Command) -> bool:
+        self.loop.call_soon_threadsafe(self._enqueue, stamp(command))
+        return True
+
+    def _enqueue(self, item: Stamped) -> None:
+        # on the loop thread, so the count needs no lock
+        self.messages.put_nowait(item)
+        self.enqueued += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"enqueued": self.enqueued}
+
+
+def make_jukebox():
+    # spotipy and the Spotify login load on the pool while the inputs start
+    from jukebox import FSM_jukebox
+
+    return FSM_jukebox()
+
+
+async def drain(messages: asyncio.Queue) -> List[Stamped]:
+    """Waits for one message, then takes everything else already queued."""
+    batch = [await messages.get()]
+    while not messages.empty():
+        batch.append(messages.get_nowait())
+    return batch
+
+
+async def dispatcher(
+    jukebox_ready: asyncio.Future, messages: asyncio.Queue, executor
+) -> None:
+    loop = asyncio.get_running_loop()
+    jukebox = await jukebox_ready
+    stats = LatencyStats()
+    try:
+        while True:
+            batch = await drain(messages)
+            stats.received += len(batch)
+            for command, queued_at in coalesce(batch):
+                logger.debug(command)
+                sent_at = monotonic()
+                try:
+                    await loop.run_in_executor(executor, jukebox.send, command)
+                except Exception:
+                    logger.exception(f"Unable to send {command}")
+                stats.add(sent_at - queued_at, monotonic() - queued_at)
+    finally:
+        stats.report()
+
+
+async def rfid_reader(
+    enqueuer: LoopEnqueuer, executor, hub: Optional[GpioHub]
+) -> None:
+    loop = asyncio.get_running_loop()
+    session = await loop.run_in_executor(
+        executor,
+        functools.partial(
+            RFIDReaderSession,
+            cooldown=4.0,
+            pin_irq=int(RFID_IRQ_PIN) if RFID_IRQ_PIN else None,
+            hub=hub,
+        ),
+    )
+    logger.info("RFID reader ready")
+    scan = None
+    try:
+        while True:
+            # short waits, so a cancelled task is never held up for long
+            scan = loop.run_in_executor(executor, session.wait_for_arrival, 1.0)
+            uid = await asyncio.shield(scan)
+            if uid is not None:
+                logger.debug(f"RFID Response - {uid}")
+                enqueuer.put(("play/pause", str(uid)))
+    finally:
+        # the reader is only closed once the scan on the pool is done with it
+        if scan is not None and not scan.done():
+            await asyncio.wait([scan])
+        session.close()
+
+
+async def run() -> None:
+    loop = asyncio.get_running_loop()
+    boot_started = monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=EXECUTOR_WORKERS, thread_name_prefix="jukebox"
+    )
+    messages: asyncio.Queue = asyncio.Queue()
+    enqueuer = LoopEnqueuer(loop, messages)
+
+    stopping = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    hub = None
+    buttons = []
+    volume = None
+    tasks: List[asyncio.Future] = []
+    stopped = asyncio.ensure_future(stopping.wait())
+    # whatever fails or stops on the way, the finally below lets go of the
+    # hub, the volume applier and the pool
+    try:
+        if GPIO_HUB:
+            hub = GpioHub(open_chip(simulated=GPIO_HUB == "simulated"))
+            loop.add_reader(hub.fileno(), hub.dispatch)
+
+        jukebox_ready = loop.run_in_executor(executor, make_jukebox)
+        tasks = [
+            asyncio.ensure_future(dispatcher(jukebox_ready, messages, executor)),
+            asyncio.ensure_future(rfid_reader(enqueuer, executor, hub)),
+        ]
+        buttons = make_buttons(enqueuer, hub=hub)
+        logger.info("Buttons ready")
+        volume = await loop.run_in_executor(
+            executor, functools.partial(VolumeControl, MAX_VOLUME=50, hub=hub)
+        )
+        logger.info("Volume ready")
+        # a signal during the Spotify login stops the runtime straight away
+        await asyncio.wait(
+            [jukebox_ready, stopped], return_when=asyncio.FIRST_COMPLETED
+        )
+        if stopped.done():
+            return
+        jukebox_ready.result()
+        logger.info(f"Runtime ready {monotonic() - boot_started:.2f}s after boot")
+
+        # a task that fails ends the runtime like a signal does
+        await asyncio.wait(tasks + [stopped], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception():
+                logger.error(f"{task} failed", exc_info=task.exception())
+            task.cancel()
+        stopped.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        logger.info(f"Button queue stats: {enqueuer.stats()}")
+        for button in buttons:
+            button.close()
+        if volume is not None:
+            volume.close()
+        if hub is not None:
+            loop.remove_reader(hub.fileno())
+            hub.close()
+        executor.shutdown(wait=False)
+
+
+def main() -> None:
+    configure_logging()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
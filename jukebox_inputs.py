@@ -0,0 +1,52 @@
+"""
+jukebox_inputs.py
+
+What both runtimes share about the box's inputs: the settings read from
+the environment, the log format and the buttons. jukebox_master and
+jukebox_async each import it, neither imports the other.
+"""
+
+import logging
+import os
+from typing import List, Optional
+
+from command_queue import InputEnqueuer
+from gpio_hub import GpioHub
+from simple_button import SimpleButton
+
+# board pin the RC522 IRQ line is wired to, unset keeps the reader polling
+RFID_IRQ_PIN = os.environ.get("RFID_IRQ_PIN")
+# what a button press does when the command queue is full, see command_queue
+QUEUE_OVERFLOW_POLICY = os.environ.get("QUEUE_OVERFLOW_POLICY", "coalesce")
+# "gpiod" or "simulated" runs buttons, volume and the RFID reader in one
+# process watching every pin through a gpio_hub.GpioHub
+GPIO_HUB = os.environ.get("GPIO_HUB")
+
+
+def configure_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(process)d-%(levelname)s %(message)s",
+        datefmt="%m/%d/%Y %I:%M:%S %p",
+    )
+
+
+def make_buttons(
+    enqueuer: InputEnqueuer, hub: Optional[GpioHub] = None
+) -> List[SimpleButton]:
+    # ["play/pause", "stop", "forward", "reverse", "randomize"]
+    # create functions for each button, they run on the GPIO callback thread
+    # so they must never wait on a full queue
+    play_result = lambda *args: enqueuer.put(("play/pause", ""))
+    stop_result = lambda *args: enqueuer.put(("stop", ""))
+    forward_result = lambda *args: enqueuer.put(("forward", ""))
+    reverse_result = lambda *args: enqueuer.put(("reverse", ""))
+    randomize_result = lambda *args: enqueuer.put(("randomize", ""))
+    # create buttons
+    return [
+        SimpleButton(pin=int(36), action=play_result, hub=hub),
+        SimpleButton(pin=int(13), action=stop_result, hub=hub),
+        SimpleButton(pin=int(29), action=forward_result, hub=hub),
+        SimpleButton(pin=int(31), action=reverse_result, hub=hub),
+        SimpleButton(pin=int(16), action=randomize_result, hub=hub),
+    ]
@@ -3,117 +3,181 @@
 It imports the various components and ties them together.
 """
 
-from jukebox import FSM_jukebox
+import argparse
+from command_queue import InputEnqueuer, LatencyStats, coalesce, drain, stamp
 from multiprocessing import Event, Queue
 from multiprocessing import Process
-from time import sleep
+from time import monotonic, sleep
 from datetime import datetime
 from datetime import timedelta
 from subprocess import call
 import logging
-from simple_button import SimpleButton
+import os
+from typing import Optional
 import signal
-from read_rfid import get_reading
+from gpio_hub import GpioHub, open_chip
+from jukebox_inputs import (
+    GPIO_HUB,
+    QUEUE_OVERFLOW_POLICY,
+    RFID_IRQ_PIN,
+    configure_logging,
+    make_buttons,
+)
+from read_rfid import RFIDReaderSession
 from volume_control import VolumeControl
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(process)d-%(levelname)s %(message)s",
-    datefmt="%m/%d/%Y %I:%M:%S %p",
-)
+configure_logging()
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# "processes" forks a process per input, "async" runs jukebox_async instead
+JUKEBOX_RUNTIME = os.environ.get("JUKEBOX_RUNTIME", "processes")
+
 
 shutdown_event = Event()
 
 
 def process_queue(messages: Queue) -> None:
     logger.info("Queue Processor Launched")
+    boot_started = monotonic()
+    # only this process talks to Spotify, the inputs never load spotipy
+    from jukebox import FSM_jukebox
+
     jukebox = FSM_jukebox()
+    stats = LatencyStats()
+    first_command = True
     try:
         while not shutdown_event.is_set():
-            # wait until there is a message in the queue
-            # logging.debug(messages.get())
-            command = messages.get()
-            logger.debug(command)
-            jukebox.send(command=command)
-            sleep(0.05)
+            # wait until there is a message in the queue, then take the
+            # whole backlog so repeated presses collapse before Spotify
+            batch = drain(messages, timeout=1.0)
+            stats.received += len(batch)
+            for command, queued_at in coalesce(batch):
+                logger.debug(command)
+                sent_at = monotonic()
+                jukebox.send(command=command)
+                stats.add(sent_at - queued_at, monotonic() - queued_at)
+                if first_command:
+                    first_command = False
+                    logger.info(
+                        f"First command handled {monotonic() - boot_started:.2f}s "
+                        + f"after boot (jukebox ready after "
+                        + f"{jukebox.boot_timings['total']:.2f}s)"
+                    )
     except KeyboardInterrupt:
         pass
+    finally:
+        stats.report()
 
 
-def rfid_reader(messages: Queue) -> None:
+def rfid_reader(messages: Queue, hub: Optional[GpioHub] = None) -> None:
     logger.info("RFID Reader Launched")
+    # one reader for the life of the process, repeats of the same record are
+    # held back per tag by the cooldown instead of a global sleep
+    session = RFIDReaderSession(
+        cooldown=4.0,
+        pin_irq=int(RFID_IRQ_PIN) if RFID_IRQ_PIN else None,
+        hub=hub,
+    )
+    logger.info("RFID reader ready")
     try:
         while not shutdown_event.is_set():
-            rfid_response = get_reading()
+            rfid_response = session.wait_for_arrival(timeout=1.0)
             if rfid_response != None:
                 logger.debug(f"RFID Response - {rfid_response}")
                 result = ("play/pause", str(rfid_response))
-                messages.put(result)
-                sleep(4)
-            else:
-                sleep(0.05)
+                messages.put(stamp(result))
     except KeyboardInterrupt:
         pass
+    finally:
+        session.close()
 
 
 def buttons(messages: Queue) -> None:
     logger.info("Button manager Launched")
-    # ["play/pause", "stop", "forward", "reverse", "randomize"]
-    # create functions for each button
-    play_result = lambda *args: messages.put(("play/pause", ""))
-    stop_result = lambda *args: messages.put(("stop", ""))
-    forward_result = lambda *args: messages.put(("forward", ""))
-    reverse_result = lambda *args: messages.put(("reverse", ""))
-    randomize_result = lambda *args: messages.put(("randomize", ""))
-    # create buttons
-    play_button = SimpleButton(pin=int(36), action=play_result)
-    stop_button = SimpleButton(pin=int(13), action=stop_result)
-    forward_button = SimpleButton(pin=int(29), action=forward_result)
-    reverse_button = SimpleButton(pin=int(31), action=reverse_result)
-    randomize_button = SimpleButton(pin=int(16), action=randomize_result)
+    enqueuer = InputEnqueuer(messages, policy=QUEUE_OVERFLOW_POLICY)
+    button_list = make_buttons(enqueuer)
     # while not shutdown_event.is_set():
-    logger.debug("Buttons created")
+    logger.info("Buttons ready")
     try:
         while True:
             signal.pause()
     except KeyboardInterrupt:
         pass
+    finally:
+        logger.info(f"Button queue stats: {enqueuer.stats()}")
+        for button in button_list:
+            button.close()
 
 
 def volume_process() -> None:
     logger.info("Volume process launched")
     volume = VolumeControl(MAX_VOLUME=50)
-    logger.debug("Volume object created")
+    logger.info("Volume ready")
     try:
         signal.pause()
     except KeyboardInterrupt:
         pass
     finally:
+        volume.close()
         logger.debug("Volume process ended")
 
 
+def gpio_inputs(messages: Queue) -> None:
+    """Buttons, volume and RFID reader on one hub, in place of three processes."""
+    logger.info(f"GPIO hub process launched ({GPIO_HUB})")
+    hub = GpioHub(open_chip(simulated=GPIO_HUB == "simulated")).start()
+    enqueuer = InputEnqueuer(messages, policy=QUEUE_OVERFLOW_POLICY)
+    button_list = make_buttons(enqueuer, hub=hub)
+    logger.info("Buttons ready")
+    volume = VolumeControl(MAX_VOLUME=50, hub=hub)
+    logger.info("Volume ready")
+    try:
+        # the reader blocks on its IRQ edges from the hub thread
+        rfid_reader(messages, hub=hub)
+    finally:
+        logger.info(f"Button queue stats: {enqueuer.stats()}")
+        for button in button_list:
+            button.close()
+        volume.close()
+        hub.close()
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Runs the jukebox.")
+    parser.add_argument(
+        "--runtime", choices=("processes", "async"), default=JUKEBOX_RUNTIME
+    )
+    args = parser.parse_args()
+    if args.runtime == "async":
+        import jukebox_async
+
+        jukebox_async.main()
+        return
+
     messages = Queue(maxsize=6)
 
     logger.info("Launching Queue process")
     Process(target=process_queue, args=(messages,)).start()
     logger.debug("Back from launch")
 
-    logger.info("Launching rfid reader process")
-    Process(target=rfid_reader, args=(messages,)).start()
-    logger.debug("Back from launch")
-
-    logger.info("Launching button manager process")
-    Process(target=buttons, args=(messages,)).start()
-    logger.debug("Back from launch")
-
-    logger.info("Launching volume manager process")
-    Process(target=volume_process).start()
-    logger.debug("Back from launch")
+    if GPIO_HUB:
+        logger.info("Launching GPIO hub process")
+        Process(target=gpio_inputs, args=(messages,)).start()
+        logger.debug("Back from launch")
+    else:
+        logger.info("Launching rfid reader process")
+        Process(target=rfid_reader, args=(messages,)).start()
+        logger.debug("Back from launch")
+
+        logger.info("Launching button manager process")
+        Process(target=buttons, args=(messages,)).start()
+        logger.debug("Back from launch")
+
+        logger.info("Launching volume manager process")
+        Process(target=volume_process).start()
+        logger.debug("Back from launch")
 
     try:
         while not shutdown_event.is_set():
@@ -23,6 +23,7 @@
 import RPi.GPIO as GPIO
 import spidev
 import signal
+import threading
 import time
 import logging
 
@@ -124,6 +125,36 @@ class MFRC522:
     Reserved33 = 0x3E
     Reserved34 = 0x3F
 
+    # configuration registers the chip never changes by itself, with
+    # shadow_registers on their last written value stands in for a read
+    SHADOW_REGS = frozenset(
+        [
+            CommIEnReg,
+            DivlEnReg,
+            WaterLevelReg,
+            BitFramingReg,
+            ModeReg,
+            TxModeReg,
+            RxModeReg,
+            TxControlReg,
+            TxAutoReg,
+            TxSelReg,
+            RxSelReg,
+            RxThresholdReg,
+            DemodReg,
+            MifareReg,
+            ModWidthReg,
+            RFCfgReg,
+            GsNReg,
+            CWGsPReg,
+            ModGsPReg,
+            TModeReg,
+            TPrescalerReg,
+            TReloadRegH,
+            TReloadRegL,
+        ]
+    )
+
     serNum = []
 
     def __init__(
@@ -134,10 +165,18 @@ class MFRC522:
         pin_mode=10,
         pin_rst=-1,
         debugLevel="WARNING",
+        spi=None,
+        pin_irq=None,
+        timeout=0.05,
+        shadow_registers=False,
+        hub=None,
     ):
-        self.spi = spidev.SpiDev()
-        self.spi.open(bus, device)
-        self.spi.max_speed_hz = spd
+        if spi is None:
+            spi = spidev.SpiDev()
+            spi.open(bus, device)
+            spi.max_speed_hz = spd
+        self.spi = spi
+        self._shadow = {} if shadow_registers else None
 
         self.logger = logging.getLogger("mfrc522Logger")
         self.logger.addHandler(logging.StreamHandler())
@@ -159,19 +198,60 @@ class MFRC522:
 
         GPIO.setup(pin_rst, GPIO.OUT)
         GPIO.output(pin_rst, 1)
+
+        # with the IRQ line wired up, waits block on the pin instead of
+        # polling CommIrqReg, timeout bounds every wait in seconds either way
+        self.pin_irq = pin_irq
+        self.timeout = timeout
+        # a gpio_hub.GpioHub watching the IRQ pin sets _irq on falling edges
+        self.hub = hub
+        self._irq = threading.Event()
+        if self.pin_irq is not None and self.hub is not None:
+            self.hub.add_input(self.pin_irq, self._irq_edge, edge="falling")
+        elif self.pin_irq is not None:
+            GPIO.setup(self.pin_irq, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         self.MFRC522_Init()
 
     def MFRC522_Reset(self):
         self.Write_MFRC522(self.CommandReg, self.PCD_RESETPHASE)
+        # every register is back at its reset value
+        if self._shadow is not None:
+            self._shadow.clear()
 
     def Write_MFRC522(self, addr, val):
-        val = self.spi.xfer2([(addr << 1) & 0x7E, val])
+        self.spi.xfer2([(addr << 1) & 0x7E, val])
+        if self._shadow is not None and addr in self.SHADOW_REGS:
+            self._shadow[addr] = val & 0xFF
 
     def Read_MFRC522(self, addr):
+        if self._shadow is not None and addr in self._shadow:
+            return self._shadow[addr]
         val = self.spi.xfer2([((addr << 1) & 0x7E) | 0x80, 0])
+        if self._shadow is not None and addr in self.SHADOW_REGS:
+            self._shadow[addr] = val[1]
         return val[1]
 
+    def Write_MFRC522_Burst(self, addr, vals):
+        # the address byte is sent once, every following byte lands in addr
+        if len(vals) > 0:
+            self.spi.xfer2([(addr << 1) & 0x7E] + list(vals))
+            if self._shadow is not None and addr in self.SHADOW_REGS:
+                self._shadow[addr] = vals[-1] & 0xFF
+
+    def Read_MFRC522_Burst(self, addr, count):
+        return self.Read_MFRC522_Regs([addr] * count)
+
+    def Read_MFRC522_Regs(self, addrs):
+        # each byte clocks out the address of the next read, the chip answers
+        # one byte behind so the trailing 0 collects the last value
+        if len(addrs) == 0:
+            return []
+        val = self.spi.xfer2([((addr << 1) & 0x7E) | 0x80 for addr in addrs] + [0])
+        return val[1:]
+
     def Close_MFRC522(self):
+        if self.pin_irq is not None and self.hub is not None:
+            self.hub.remove_input(self.pin_irq)
         self.spi.close()
         GPIO.cleanup()
 
@@ -183,6 +263,25 @@ class MFRC522:
         tmp = self.Read_MFRC522(reg)
         self.Write_MFRC522(reg, tmp & (~mask))
 
+    def _irq_edge(self, edge):
+        self._irq.set()
+
+    def Wait_IRQ(self, timeout):
+        if self.hub is not None:
+            # cleared before the level check, an edge after it sets it again
+            self._irq.clear()
+            if self.hub.value(self.pin_irq) == GPIO.LOW:
+                return
+            self._irq.wait(timeout)
+            return
+        # the chip may have finished before we got here, the pin is then
+        # already low and no edge will come
+        if GPIO.input(self.pin_irq) == GPIO.LOW:
+            return
+        GPIO.wait_for_edge(
+            self.pin_irq, GPIO.FALLING, timeout=max(1, int(timeout * 1000))
+        )
+
     def AntennaOn(self):
         temp = self.Read_MFRC522(self.TxControlReg)
         if ~(temp & 0x03):
@@ -207,39 +306,52 @@ class MFRC522:
             irqEn = 0x77
             waitIRq = 0x30
 
-        self.Write_MFRC522(self.CommIEnReg, irqEn | 0x80)
+        if self.pin_irq is None:
+            self.Write_MFRC522(self.CommIEnReg, irqEn | 0x80)
+        else:
+            # only let completion, error and timer interrupts drive the pin,
+            # TxIRq and LoAlertIRq would pull it low before the answer arrives
+            self.Write_MFRC522(self.CommIEnReg, (irqEn & 0x33) | 0x80)
         self.ClearBitMask(self.CommIrqReg, 0x80)
         self.SetBitMask(self.FIFOLevelReg, 0x80)
 
         self.Write_MFRC522(self.CommandReg, self.PCD_IDLE)
 
-        for i in range(len(sendData)):
-            self.Write_MFRC522(self.FIFODataReg, sendData[i])
+        self.Write_MFRC522_Burst(self.FIFODataReg, sendData)
 
         self.Write_MFRC522(self.CommandReg, command)
 
         if command == self.PCD_TRANSCEIVE:
             self.SetBitMask(self.BitFramingReg, 0x80)
 
-        i = 2000
+        timed_out = False
+        deadline = time.monotonic() + self.timeout
         while True:
             n = self.Read_MFRC522(self.CommIrqReg)
-            i -= 1
-            if ~((i != 0) and ~(n & 0x01) and ~(n & waitIRq)):
+            if (n & 0x01) or (n & waitIRq):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
                 break
+            if self.pin_irq is not None:
+                self.Wait_IRQ(remaining)
 
         self.ClearBitMask(self.BitFramingReg, 0x80)
 
-        if i != 0:
-            if (self.Read_MFRC522(self.ErrorReg) & 0x1B) == 0x00:
+        if not timed_out:
+            error, level, control = self.Read_MFRC522_Regs(
+                [self.ErrorReg, self.FIFOLevelReg, self.ControlReg]
+            )
+            if (error & 0x1B) == 0x00:
                 status = self.MI_OK
 
                 if n & irqEn & 0x01:
                     status = self.MI_NOTAGERR
 
                 if command == self.PCD_TRANSCEIVE:
-                    n = self.Read_MFRC522(self.FIFOLevelReg)
-                    lastBits = self.Read_MFRC522(self.ControlReg) & 0x07
+                    n = level
+                    lastBits = control & 0x07
                     if lastBits != 0:
                         backLen = (n - 1) * 8 + lastBits
                     else:
@@ -250,8 +362,7 @@ class MFRC522:
                     if n > self.MAX_LEN:
                         n = self.MAX_LEN
 
-                    for i in range(n):
-                        backData.append(self.Read_MFRC522(self.FIFODataReg))
+                    backData = self.Read_MFRC522_Burst(self.FIFODataReg, n)
             else:
                 status = self.MI_ERR
 
@@ -301,19 +412,15 @@ class MFRC522:
         self.ClearBitMask(self.DivIrqReg, 0x04)
         self.SetBitMask(self.FIFOLevelReg, 0x80)
 
-        for i in range(len(pIndata)):
-            self.Write_MFRC522(self.FIFODataReg, pIndata[i])
+        self.Write_MFRC522_Burst(self.FIFODataReg, pIndata)
 
         self.Write_MFRC522(self.CommandReg, self.PCD_CALCCRC)
-        i = 0xFF
+        deadline = time.monotonic() + self.timeout
         while True:
             n = self.Read_MFRC522(self.DivIrqReg)
-            i -= 1
-            if not ((i != 0) and not (n & 0x04)):
+            if (n & 0x04) or time.monotonic() >= deadline:
                 break
-        pOutData = []
-        pOutData.append(self.Read_MFRC522(self.CRCResultRegL))
-        pOutData.append(self.Read_MFRC522(self.CRCResultRegM))
+        pOutData = self.Read_MFRC522_Regs([self.CRCResultRegL, self.CRCResultRegM])
         return pOutData
 
     def MFRC522_SelectTag(self, serNum):
@@ -441,4 +548,7 @@ class MFRC522:
         self.Write_MFRC522(self.TxAutoReg, 0x40)
         self.Write_MFRC522(self.ModeReg, 0x3D)
         self.Write_MFRC522(self.RFCfgReg, 0x06 << 4)
+        if self.pin_irq is not None:
+            # drive the IRQ pin push-pull rather than open drain
+            self.Write_MFRC522(self.DivlEnReg, 0x80)
         self.AntennaOn()
@@ -2,6 +2,7 @@
 
 from . import MFRC522
 import RPi.GPIO as GPIO
+import time
   
 class SimpleMFRC522:
 
@@ -10,18 +11,36 @@ class SimpleMFRC522:
   KEY = [0xFF,0xFF,0xFF,0xFF,0xFF,0xFF]
   BLOCK_ADDRS = [8, 9, 10]
   
-  def __init__(self):
-    self.READER = MFRC522()
+  def __init__(
+      self,
+      pin_irq=None,
+      timeout=0.05,
+      poll_interval=0.05,
+      shadow_registers=False,
+      hub=None,
+  ):
+    # pin_irq lets the reader block on the RC522 IRQ line, timeout bounds
+    # each wait on the chip and poll_interval paces the blocking reads, hub
+    # is a gpio_hub.GpioHub to watch the IRQ line through
+    self.READER = MFRC522(
+        pin_irq=pin_irq,
+        timeout=timeout,
+        shadow_registers=shadow_registers,
+        hub=hub,
+    )
+    self.poll_interval = poll_interval
   
   def read(self):
       id, text = self.read_no_block()
       while not id:
+          time.sleep(self.poll_interval)
           id, text = self.read_no_block()
       return id, text
 
   def read_id(self):
     id = self.read_id_no_block()
     while not id:
+      time.sleep(self.poll_interval)
       id = self.read_id_no_block()
     return id
 
@@ -0,0 +1,160 @@
+"""A software stand-in for spidev.SpiDev that behaves like an MFRC522 chip.
+
+It answers REQA, anticollision, select, authentication, block reads and CRC
+calculation for a single simulated tag, and counts every transaction so the
+register access pattern of the driver can be measured without hardware.
+"""
+
+import time
+
+
+class FakeSpiDev:
+    # register addresses, see MFRC522 for the full map
+    CommandReg = 0x01
+    CommIrqReg = 0x04
+    DivIrqReg = 0x05
+    Status2Reg = 0x08
+    FIFODataReg = 0x09
+    FIFOLevelReg = 0x0A
+    ControlReg = 0x0C
+    BitFramingReg = 0x0D
+    CRCResultRegM = 0x21
+    CRCResultRegL = 0x22
+
+    PCD_IDLE = 0x00
+    PCD_AUTHENT = 0x0E
+    PCD_TRANSCEIVE = 0x0C
+    PCD_RESETPHASE = 0x0F
+    PCD_CALCCRC = 0x03
+
+    def __init__(self, uid=None, latency=0.0, blocks=None):
+        """
+        Parameter uid: 4 byte uid of the tag in the field, None for no tag.
+        Parameter latency: seconds each xfer2 call takes, to model the ioctl.
+        Parameter blocks: dict of block number -> 16 bytes stored on the tag.
+        """
+        self.uid = uid
+        self.latency = latency
+        self.blocks = blocks if blocks is not None else {}
+        self.max_speed_hz = 0
+        self.regs = [0] * 64
+        self.fifo = []
+        self.transactions = 0
+        self.bytes = 0
+
+    def open(self, bus, device):
+        pass
+
+    def close(self):
+        pass
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def xfer2(self, data):
+        self.transactions += 1
+        self.bytes += len(data)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if data[0] & 0x80:
+            # read: every byte names the next register, answers lag one byte
+            result = [0]
+            for byte in data[1:]:
+                result.append(self._read(data[len(result) - 1] >> 1 & 0x3F))
+            return result
+
+        addr = data[0] >> 1 & 0x3F
+        for val in data[1:]:
+            self._write(addr, val)
+        return [0] * len(data)
+
+    def _read(self, addr):
+        if addr == self.FIFODataReg:
+            return self.fifo.pop(0) if self.fifo else 0
+        if addr == self.FIFOLevelReg:
+            return len(self.fifo)
+        return self.regs[addr]
+
+    def _write(self, addr, val):
+        if addr == self.FIFODataReg:
+            self.fifo.append(val)
+        elif addr == self.FIFOLevelReg:
+            if val & 0x80:
+                self.fifo = []
+        elif addr in (self.CommIrqReg, self.DivIrqReg):
+            # bit 7 selects whether the marked bits are set or cleared
+            if val & 0x80:
+                self.regs[addr] |= val & 0x7F
+            else:
+                self.regs[addr] &= ~val & 0x7F
+        elif addr == self.CommandReg:
+            self.regs[addr] = val
+            self._command(val & 0x0F)
+        else:
+            self.regs[addr] = val
+            if addr == self.BitFramingReg and val & 0x80:
+                if self.regs[self.CommandReg] & 0x0F == self.PCD_TRANSCEIVE:
+                    self._transceive()
+
+    def _command(self, command):
+        if command == self.PCD_RESETPHASE:
+            self.regs = [0] * 64
+            self.fifo = []
+        elif command == self.PCD_CALCCRC:
+            crc = crc_a(self.fifo)
+            self.fifo = []
+            self.regs[self.CRCResultRegL] = crc & 0xFF
+            self.regs[self.CRCResultRegM] = crc >> 8
+            self.regs[self.DivIrqReg] |= 0x04
+        elif command == self.PCD_AUTHENT:
+            self.fifo = []
+            if self.uid is not None:
+                self.regs[self.Status2Reg] |= 0x08
+            self.regs[self.CommIrqReg] |= 0x10
+
+    def _transceive(self):
+        frame, self.fifo = self.fifo, []
+        answer = self._answer(frame) if self.uid is not None else None
+        if answer is None:
+            # nothing answered, the chip's timer runs out
+            self.regs[self.CommIrqReg] |= 0x01
+            return
+        self.fifo = answer
+        # every answer ends on a whole byte, so RxLastBits stays 0
+        self.regs[self.ControlReg] = 0x00
+        self.regs[self.CommIrqReg] |= 0x30
+
+    def _answer(self, frame):
+        if frame[0] in (0x26, 0x52):
+            # REQA / WUPA are answered with a Mifare Classic ATQA
+            return [0x04, 0x00]
+        if frame[:2] == [0x93, 0x20]:
+            check = 0
+            for byte in self.uid:
+                check ^= byte
+            return list(self.uid) + [check]
+        if frame[:2] == [0x93, 0x70]:
+            return [0x08] + crc_bytes([0x08])
+        if frame[0] == 0x30:
+            block = list(self.blocks.get(frame[1], [0] * 16))
+            return block + crc_bytes(block)
+        if frame[0] == 0x50:
+            return None
+        return [0x0A]
+
+
+def crc_a(data):
+    """ISO/IEC 14443-A CRC, as calculated by the chip's CalcCRC command."""
+    crc = 0x6363
+    for byte in data:
+        byte ^= crc & 0xFF
+        byte = (byte ^ (byte << 4)) & 0xFF
+        crc = (crc >> 8) ^ (byte << 8) ^ (byte << 3) ^ (byte >> 4)
+    return crc & 0xFFFF
+
+
+def crc_bytes(data):
+    crc = crc_a(data)
+    return [crc & 0xFF, crc >> 8]
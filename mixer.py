@@ -0,0 +1,274 @@
+"""
+mixer.py
+
+Volume backends for VolumeControl. Every backend keeps its mixer open for
+its whole life so a volume change costs a write, not a process spawn.
+
+    AlsaMixer   direct ALSA mixer calls, needs the pyalsaaudio package
+    AmixerPipe  one long-lived `amixer -s` fed commands on stdin
+    AmixerShell the old way, one shell and amixer per change
+    FakeMixer   records the volumes, for benchmarks and boxes without a DAC
+
+open_mixer() picks one by name, MIXER_BACKEND in the environment or the
+first of amixer and alsa that works. VolumeApplier sits in front of any of
+them so the encoder never waits on the mixer.
+"""
+
+import logging
+import os
+from collections import deque
+import subprocess
+import threading
+import time
+from typing import Deque, List, Optional, Sequence, Tuple
+
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
+
+CARD = "IQaudIODAC"
+CONTROL = "Digital"
+MIXER_BACKEND = os.environ.get("MIXER_BACKEND")
+
+
+class AmixerShell:
+    """Runs amixer through a shell for every change, kept for comparison."""
+
+    def __init__(self, card: str = CARD, control: str = CONTROL, amixer="amixer"):
+        self.card = card
+        self.control = control
+        self.amixer = amixer
+
+    def set_volume(self, vol: int) -> None:
+        subprocess.run(
+            args=f"{self.amixer} -c {self.card} sset '{self.control}',0 "
+            + f"{vol}%,{vol}% -M",
+            shell=True,
+            check=True,
+            capture_output=False,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class AmixerPipe:
+    """Keeps one `amixer -s` running and writes a sset line per change.
+
+    amixer reads its stdin line by line and applies each command as it
+    arrives. If it exits, the next change starts a new one.
+    """
+
+    def __init__(self, card: str = CARD, control: str = CONTROL, amixer="amixer"):
+        self.card = card
+        self.control = control
+        self.amixer = amixer
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._start()
+
+    def set_volume(self, vol: int) -> None:
+        line = f"sset '{self.control}',0 {vol}%,{vol}%\n".encode()
+        with self._lock:
+            if self._process.poll() is not None:
+                logging.warning("amixer exited, restarting it")
+                self._start()
+            for attempt in range(2):
+                try:
+                    self._process.stdin.write(line)
+                    self._process.stdin.flush()
+                    return
+                except (BrokenPipeError, ValueError) as e:
+                    if attempt:
+                        raise
+                    logging.warning(f"amixer exited ({e}), restarting it")
+                    self._start()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._process.wait()
+                self._process = None
+
+    def _start(self) -> None:
+        # -q silences the reply to every command, -M uses the mapped volume
+        # scale like the command line did
+        self._process = subprocess.Popen(
+            [self.amixer, "-c", self.card, "-q", "-M", "-s"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+class AlsaMixer:
+    """Sets the volume through one ALSA mixer handle, no process at all.
+
+    pyalsaaudio sets the raw volume in percent, it has no mapped scale like
+    amixer -M, so the same number sounds quieter at the low end.
+    """
+
+    def __init__(self, card: str = CARD, control: str = CONTROL):
+        if alsaaudio is None:
+            raise RuntimeError("pyalsaaudio is not installed")
+        self.card = card
+        self.control = control
+        try:
+            self._mixer = alsaaudio.Mixer(
+                control=control, cardindex=alsaaudio.cards().index(card)
+            )
+        except alsaaudio.ALSAAudioError as e:
+            raise RuntimeError(f"Unable to open {card} {control}: {e}")
+
+    def set_volume(self, vol: int) -> None:
+        self._mixer.setvolume(vol)
+
+    def close(self) -> None:
+        self._mixer.close()
+
+
+class FakeMixer:
+    """Remembers every volume it is given, each change takes `latency` seconds."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.volumes: List[int] = []
+
+    @property
+    def volume(self) -> Optional[int]:
+        return self.volumes[-1] if self.volumes else None
+
+    def set_volume(self, vol: int) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        self.volumes.append(vol)
+
+    def close(self) -> None:
+        pass
+
+
+BACKENDS = {
+    "alsa": AlsaMixer,
+    "amixer": AmixerPipe,
+    "shell": AmixerShell,
+    "fake": FakeMixer,
+}
+
+
+def open_mixer(backend: Optional[str] = MIXER_BACKEND, **kwargs):
+    """Returns a mixer from BACKENDS.
+
+    Parameter backend: a BACKENDS name, or None for the first of amixer and
+        alsa that opens. amixer comes first, it keeps the mapped volume
+        scale the box has always used, alsa has to be asked for.
+    """
+    names: Sequence[str] = (backend,) if backend else ("amixer", "alsa")
+    for name in names:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown mixer backend {name}")
+        try:
+            mixer = BACKENDS[name](**kwargs)
+        except (RuntimeError, OSError, ValueError) as e:
+            if backend:
+                raise
+            logging.info(f"Mixer backend {name} unavailable: {e}")
+            continue
+        logging.debug(f"Using mixer backend {name}")
+        return mixer
+    raise RuntimeError("No mixer backend available")
+
+
+class VolumeApplier:
+    """Writes the newest target volume to a mixer from its own thread.
+
+    set() only records the target and returns, so encoder callbacks never
+    block. The applier thread writes whatever the target is when it gets to
+    it, skipping the values a fast spin went through, at most `max_rate`
+    times per second, and always ends on the last target set. A write that
+    fails is tried again after `retry_delay` seconds, or as soon as a new
+    target is set.
+    """
+
+    def __init__(self, mixer, max_rate: float = 25.0, retry_delay: float = 1.0):
+        self.mixer = mixer
+        self.min_interval = 1.0 / max_rate
+        self.retry_delay = retry_delay
+        self.writes = 0
+        # seconds from a set() to the write of its value, for recent writes
+        self.latencies: Deque[float] = deque(maxlen=256)
+
+        self._cond = threading.Condition()
+        self._target: Optional[Tuple[int, float]] = None
+        self._applied: Optional[int] = None
+        self._closing = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def target(self) -> Optional[int]:
+        target = self._target
+        return None if target is None else target[0]
+
+    def set(self, vol: int) -> None:
+        """Makes vol the volume to apply next, never blocks on the mixer."""
+        with self._cond:
+            self._target = (vol, time.monotonic())
+            self._cond.notify()
+
+    def wait_applied(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the current target is on the mixer, False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(self._settled, timeout)
+
+    def close(self, timeout: Optional[float] = 1.0) -> None:
+        """Applies the last target, then stops the thread and the mixer."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self.mixer.close()
+
+    def _settled(self) -> bool:
+        return self._target is None or self._target[0] == self._applied
+
+    def _run(self) -> None:
+        last_write = float("-inf")
+        # the target whose write failed last, the mixer is not on it yet
+        failed = None
+        while True:
+            with self._cond:
+                if failed is not None:
+                    self._cond.wait_for(
+                        lambda: self._closing or self._target is not failed,
+                        self.retry_delay,
+                    )
+                self._cond.wait_for(lambda: self._closing or not self._settled())
+                # closing gives up on a target that already failed
+                if self._settled() or (self._closing and self._target is failed):
+                    return
+            # hold back to the rate cap, the target may move meanwhile
+            delay = last_write + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with self._cond:
+                target = self._target
+            vol, set_at = target
+            try:
+                self.mixer.set_volume(vol)
+            except Exception as e:
+                logging.warning(f"Unable to set volume to {vol}: {e}")
+                failed = target
+                last_write = time.monotonic()
+                continue
+            failed = None
+            last_write = time.monotonic()
+            with self._cond:
+                self._applied = vol
+                self.writes += 1
+                self.latencies.append(last_write - set_at)
+                self._cond.notify_all()
@@ -0,0 +1,129 @@
+"""
+playback_state.py
+
+In-memory mirror of the Spotify device list, so the jukebox can tell whether
+it is the active device and what its device id is without an HTTP round trip
+on every button press.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import spotipy
+
+JUKEBOX_NAME = "Kid_Jukebox"
+
+
+def find_device(devices: List[Dict], name: str) -> Optional[Dict]:
+    """Returns the device called name from a devices() result, if listed."""
+    for device in devices:
+        if device.get("name") == name:
+            return device
+    return None
+
+
+class PlaybackStateMirror:
+    """Caches which device is active and the jukebox's device id.
+
+    Answers are served from memory while they are younger than `ttl` seconds,
+    older answers are fetched again on demand. Our own writes record the
+    state they lead to through invalidate(), which also brings the next
+    background poll forward. The poller runs every `min_interval` seconds
+    after a change and backs off to `max_interval` while nothing moves.
+    `max_interval` is kept below `ttl`, so while the poller runs a press
+    never finds the answer stale and waits on devices() itself.
+    """
+
+    def __init__(
+        self,
+        client: Callable[[], spotipy.client.Spotify],
+        device_name: str = JUKEBOX_NAME,
+        ttl: float = 15.0,
+        min_interval: float = 2.0,
+        max_interval: float = 10.0,
+    ):
+        self._client = client
+        self.device_name = device_name
+        self.ttl = ttl
+        self.min_interval = min_interval
+        # a third of the ttl to spare for a slow devices() call
+        self.max_interval = min(max_interval, ttl * 2 / 3)
+
+        self._lock = threading.Lock()
+        self._device_id: Optional[str] = None
+        self._active = False
+        self._updated = 0.0
+        self._interval = min_interval
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def device_id(self) -> Optional[str]:
+        """The jukebox's device id, the last one seen if it went missing."""
+        if self._device_id is None:
+            self.refresh()
+        return self._device_id
+
+    def is_jukebox_active(self) -> bool:
+        """Returns True if the jukebox is the active device."""
+        if time.monotonic() - self._updated > self.ttl:
+            self.refresh()
+        return self._active
+
+    def refresh(self) -> bool:
+        """Fetches the device list, returns True if anything changed."""
+        try:
+            devices = self._client().devices().get("devices", [])
+        except Exception as e:
+            logging.warning(f"Unable to refresh playback state: {e}")
+            return False
+        device = find_device(devices, self.device_name)
+        with self._lock:
+            before = (self._device_id, self._active)
+            if device is not None:
+                self._device_id = device.get("id")
+                self._active = device.get("is_active") == True
+            else:
+                self._active = False
+            self._updated = time.monotonic()
+            changed = before != (self._device_id, self._active)
+        if changed:
+            logging.debug(
+                f"Playback state changed: id={self._device_id}, active={self._active}"
+            )
+        return changed
+
+    def invalidate(self, active: Optional[bool] = None) -> None:
+        """Called after our own writes.
+
+        Parameter active: the active state the write leads to. When given it
+        is served straight away, otherwise the next query fetches again.
+        """
+        with self._lock:
+            if active is None:
+                self._updated = 0.0
+            else:
+                self._active = active
+                self._updated = time.monotonic()
+            self._interval = self.min_interval
+        self._wake.set()
+
+    def start(self) -> None:
+        """Starts the background poller as a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _poll(self) -> None:
+        while True:
+            if self._wake.wait(self._interval):
+                # a write just happened, start waiting again on the short interval
+                self._wake.clear()
+                continue
+            if self.refresh():
+                self._interval = self.min_interval
+            else:
+                self._interval = min(self._interval * 2, self.max_interval)
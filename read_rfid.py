@@ -8,10 +8,12 @@ MISO connects to Pin 21.
 GND connects to Pin 6.
 RST connects to Pin 22.
 3.3v connects to Pin 1.
+IRQ connects to Pin 18 (optional, see RFID_IRQ_PIN).
 """
 
 import RPi.GPIO as GPIO
-from time import sleep
+from time import sleep, monotonic
+from typing import Dict, Optional
 from mfrc522 import SimpleMFRC522
 import logging
 
@@ -21,17 +23,145 @@ logging.basicConfig(
     format="%(asctime)s %(process)d-%(levelname)s %(message)s",
     datefmt="%m/%d/%Y %I:%M:%S %p",
 )
-reader = SimpleMFRC522()
+
+# Presence states tracked for every tag the session has seen
+TAG_PRESENT = "present"
+TAG_HELD = "held"
+TAG_REMOVED = "removed"
+
+# Scan modes: uid runs Request + Anticoll only, full also authenticates and
+# reads the text blocks on every scan
+SCAN_UID = "uid"
+SCAN_FULL = "full"
+
+
+class RFIDReaderSession:
+    """Keeps one reader open and reports each tag only when it arrives.
+
+    A tag is 'present' on the scan it first answers, 'held' while it keeps
+    answering and 'removed' once it has been silent for `removal_timeout`
+    seconds. An arrival of the same tag within `cooldown` seconds of its
+    last reported arrival is swallowed, other tags are reported right away.
+
+    Passing `pin_irq` makes every scan block on the RC522 IRQ line rather
+    than polling the chip, `timeout` caps how long each chip wait may take.
+    With a gpio_hub.GpioHub as `hub` the IRQ line is watched through it.
+
+    The default SCAN_UID mode is all playback needs, read_text() does the
+    authenticated block read on demand for the tag in the field. The reader
+    is built with shadowed configuration registers since the session owns
+    it for its whole life.
+    """
+
+    def __init__(
+        self,
+        reader: Optional[SimpleMFRC522] = None,
+        cooldown: float = 4.0,
+        removal_timeout: float = 1.0,
+        poll_interval: float = 0.05,
+        pin_irq: Optional[int] = None,
+        timeout: float = 0.05,
+        mode: str = SCAN_UID,
+        shadow_registers: bool = True,
+        hub=None,
+    ):
+        if mode not in (SCAN_UID, SCAN_FULL):
+            raise ValueError(f"Unknown scan mode {mode}")
+        if reader is None:
+            reader = SimpleMFRC522(
+                pin_irq=pin_irq,
+                timeout=timeout,
+                poll_interval=poll_interval,
+                shadow_registers=shadow_registers,
+                hub=hub,
+            )
+        self.reader = reader
+        self.cooldown = cooldown
+        self.removal_timeout = removal_timeout
+        self.poll_interval = poll_interval
+        self.mode = mode
+        self._states: Dict[int, str] = {}
+        self._last_seen: Dict[int, float] = {}
+        self._last_arrival: Dict[int, float] = {}
+
+    def state(self, uid: int) -> str:
+        """Returns the presence state of uid, unseen tags count as removed."""
+        return self._states.get(uid, TAG_REMOVED)
+
+    def scan(self) -> Optional[int]:
+        """Runs a single non-blocking scan and returns the uid in the field."""
+        if self.mode == SCAN_UID:
+            return self.reader.read_id_no_block()
+        id, text = self.reader.read_no_block()
+        return id
+
+    def read_text(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Does the full authenticated read of the tag in the field."""
+        deadline = None if timeout is None else monotonic() + timeout
+        while deadline is None or monotonic() < deadline:
+            id, text = self.reader.read_no_block()
+            if id is not None:
+                return text
+            sleep(self.poll_interval)
+        return None
+
+    def poll(self) -> Optional[int]:
+        """Scans once and returns the uid if a tag has just arrived."""
+        uid = self.scan()
+        now = monotonic()
+        self._expire(now, current=uid)
+        if uid is None:
+            return None
+
+        self._last_seen[uid] = now
+        if self.state(uid) != TAG_REMOVED:
+            self._states[uid] = TAG_HELD
+            return None
+
+        self._states[uid] = TAG_PRESENT
+        last_arrival = self._last_arrival.get(uid)
+        if last_arrival is not None and now - last_arrival < self.cooldown:
+            logging.debug(f"Tag {uid} back within cooldown, ignoring")
+            return None
+        self._last_arrival[uid] = now
+        return uid
+
+    def wait_for_arrival(self, timeout: Optional[float] = None) -> Optional[int]:
+        """Blocks until a tag arrives, returns None if timeout passes first."""
+        deadline = None if timeout is None else monotonic() + timeout
+        while deadline is None or monotonic() < deadline:
+            uid = self.poll()
+            if uid is not None:
+                return uid
+            sleep(self.poll_interval)
+        return None
+
+    def close(self) -> None:
+        self.reader.READER.Close_MFRC522()
+
+    def _expire(self, now: float, current: Optional[int]) -> None:
+        """Marks tags removed once they time out or another tag replaces them."""
+        for uid, state in self._states.items():
+            if state == TAG_REMOVED or uid == current:
+                continue
+            # the reader only answers for one tag at a time, so a new uid
+            # means the previous record was swapped out
+            silent_for = now - self._last_seen[uid]
+            if current is not None or silent_for > self.removal_timeout:
+                self._states[uid] = TAG_REMOVED
+                logging.debug(f"Tag {uid} removed")
+
+
+_session: Optional[RFIDReaderSession] = None
 
 
 def get_reading() -> str:
+    global _session
     try:
-        id = None
-        reader = SimpleMFRC522()
-        while id == None:
-            id, text = reader.read()
-            sleep(0.1)
-            logging.info(f"id is -> {id}")
+        if _session is None:
+            _session = RFIDReaderSession()
+        id = _session.wait_for_arrival()
+        logging.info(f"id is -> {id}")
     except KeyboardInterrupt:
         raise KeyboardInterrupt
     return id
@@ -43,7 +173,6 @@ def repeated_reading() -> str:
         while True:
             id = get_reading()
             logging.info(f"id is -> {id}")
-            sleep(2)
     except KeyboardInterrupt:
         pass
     finally:
@@ -51,5 +180,5 @@ def repeated_reading() -> str:
 
 
 if __name__ == "__main__":
-    repeated_reading()()
+    repeated_reading()
     GPIO.cleanup()
@@ -0,0 +1,193 @@
+"""
+record_store.py
+
+SQLite storage for the records catalogue, for libraries too big to rewrite
+as one JSON file on every change. Records are rows keyed and indexed by uid,
+with indexes on uri and name, and are updated one at a time by upserts. The
+database runs in WAL mode so update_records can write while jukeboxes read.
+
+Converts from and to the records.json format:
+
+    python record_store.py import records.json records.db
+    python record_store.py export records.db records.json
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# records paths with one of these suffixes are SQLite stores, others JSON
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# the fields update_records writes, anything else a record carries is kept
+# in the extra column so an import and export round trip loses nothing
+FIELDS = ("url", "name", "image_url", "uri")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    uid TEXT PRIMARY KEY,
+    url TEXT,
+    name TEXT,
+    image_url TEXT,
+    uri TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS records_uri ON records (uri);
+CREATE INDEX IF NOT EXISTS records_name ON records (name);
+"""
+
+_UPSERT = """
+INSERT INTO records (uid, url, name, image_url, uri, extra)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (uid) DO UPDATE SET
+    url = excluded.url,
+    name = excluded.name,
+    image_url = excluded.image_url,
+    uri = excluded.uri,
+    extra = excluded.extra
+"""
+
+
+def is_store_path(path: str) -> bool:
+    """Returns True if path names a SQLite store rather than a JSON file."""
+    return path.lower().endswith(SQLITE_SUFFIXES)
+
+
+def _row(uid, record: Dict) -> tuple:
+    extra = {key: value for key, value in record.items() if key not in FIELDS}
+    return (
+        str(uid),
+        *(record.get(field) for field in FIELDS),
+        json.dumps(extra) if extra else None,
+    )
+
+
+def _record(row: sqlite3.Row) -> Dict:
+    record = {field: row[field] for field in FIELDS if row[field] is not None}
+    if row["extra"]:
+        record.update(json.loads(row["extra"]))
+    return record
+
+
+class RecordStore:
+    """A records catalogue in a SQLite database.
+
+    One connection is shared by the threads of a process behind a lock.
+    Other processes open their own store on the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps the database consistent on power loss with NORMAL,
+            # only the last commits may be lost
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def get(self, uid) -> Optional[Dict]:
+        """Returns the record for uid, None if there is none."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM records WHERE uid = ?", (str(uid),)
+            ).fetchone()
+        return None if row is None else _record(row)
+
+    def uri_for(self, uid) -> Optional[str]:
+        """Returns the uri uid plays, None for an unknown or unresolved tag."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uri FROM records WHERE uid = ?", (str(uid),)
+            ).fetchone()
+        return None if row is None else row["uri"]
+
+    def find_by_uri(self, uri: str) -> List[str]:
+        """Returns the uids of every record that plays uri."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT uid FROM records WHERE uri = ?", (uri,)
+            ).fetchall()
+        return [row["uid"] for row in rows]
+
+    def find_by_name(self, name: str) -> List[str]:
+        """Returns the uids of every record called name."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT uid FROM records WHERE name = ?", (name,)
+            ).fetchall()
+        return [row["uid"] for row in rows]
+
+    def upsert(self, uid, record: Dict) -> None:
+        """Inserts record under uid, or replaces the record already there."""
+        with self._lock, self._db:
+            self._db.execute(_UPSERT, _row(uid, record))
+
+    def upsert_many(self, records: Dict[str, Dict]) -> int:
+        """Upserts every uid -> record in one transaction, returns the count."""
+        with self._lock, self._db:
+            self._db.executemany(
+                _UPSERT, (_row(uid, record) for uid, record in records.items())
+            )
+        return len(records)
+
+    def records(self) -> Dict[str, Dict]:
+        """Returns every record as uid -> record, in the order they were added."""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM records ORDER BY rowid").fetchall()
+        return {row["uid"]: _record(row) for row in rows}
+
+    def play_rows(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """Returns (uid, uri, name) for every record, what the catalogue needs."""
+        with self._lock:
+            rows = self._db.execute("SELECT uid, uri, name FROM records").fetchall()
+        return [tuple(row) for row in rows]
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits to the database."""
+        with self._lock:
+            return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def import_json(self, path: str) -> int:
+        """Upserts every record of a records.json file, returns the count."""
+        with open(path, "r") as records_json:
+            records = json.load(records_json)
+        return self.upsert_many(records.get("records", {}))
+
+    def export_json(self, path: str) -> int:
+        """Writes the store as a records.json file, returns the record count."""
+        records = self.records()
+        with open(path, "w") as outfile:
+            json.dump({"records": records}, outfile, indent=4)
+        return len(records)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Convert records.json and stores")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+
+    if args.action == "import":
+        store = RecordStore(args.target)
+        count = store.import_json(args.source)
+    else:
+        store = RecordStore(args.source)
+        count = store.export_json(args.target)
+    store.close()
+    logging.info(f"{args.action.capitalize()}ed {count} records")
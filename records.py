@@ -0,0 +1,193 @@
+"""
+records.py
+
+The records catalogue, a uid to PlayTarget index built from records.json or
+a record_store database. A background thread watches the source and swaps in
+a fresh index whenever it changes, so new records work without restarting
+the jukebox.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from record_store import RecordStore, is_store_path
+
+load_dotenv()
+# a path ending in .db, .sqlite or .sqlite3 selects the SQLite store
+RECORDS_PATH = os.environ.get("RECORDS_PATH", "./records.json")
+
+
+# spotify:<kind>:<base62 id>, older playlist uris also name their owner
+URI_PATTERN = re.compile(
+    r"spotify:(?:user:[^:\s]+:)?"
+    r"(album|artist|playlist|show|track|episode):[0-9A-Za-z]{22}"
+)
+# kinds played as a list of items, the others are played as a context
+ITEM_KINDS = ("track", "episode")
+
+
+class PlayTarget:
+    """A record ready to play, compiled once when the catalogue loads.
+
+    Holds the uri's kind, the start_playback payload, the record's display
+    name and the ("play/pause", target) command FSM_jukebox sends for it.
+    Instances are immutable.
+    """
+
+    __slots__ = ("uri", "kind", "payload", "name", "command")
+
+    def __init__(self, uri: str, name: str = ""):
+        """Raises ValueError if uri is not a playable Spotify uri."""
+        match = URI_PATTERN.fullmatch(uri)
+        if match is None:
+            raise ValueError(f'"{uri}" is not a playable Spotify uri')
+        kind = match.group(1)
+        if kind in ITEM_KINDS:
+            # a tuple, so the shared payload cannot change under the proxy,
+            # play_kwargs() hands spotipy the list it insists on
+            payload = {"uris": (uri,)}
+        else:
+            payload = {"context_uri": uri}
+        set_slot = super().__setattr__
+        set_slot("uri", uri)
+        set_slot("kind", kind)
+        set_slot("payload", MappingProxyType(payload))
+        set_slot("name", name)
+        set_slot("command", ("play/pause", self))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def play_kwargs(self) -> Dict[str, Any]:
+        """Returns new start_playback arguments that play the target."""
+        return {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in self.payload.items()
+        }
+
+    def __repr__(self) -> str:
+        return f"PlayTarget({self.uri!r}, {self.name!r})"
+
+
+def compile_targets(
+    rows: Iterable[Tuple[str, Optional[str], Optional[str]]]
+) -> Dict[str, PlayTarget]:
+    """Returns uid -> PlayTarget for (uid, uri, name) rows.
+
+    Records without a uri yet (update_records.py fills it in) or with a uri
+    that cannot be played are left out with a warning.
+    """
+    index = {}
+    for uid, uri, name in rows:
+        if not uri:
+            logging.warning(f"Record {uid} has no uri, skipping it")
+            continue
+        try:
+            index[str(uid)] = PlayTarget(uri, name or "")
+        except ValueError as e:
+            logging.warning(f"Record {uid} rejected: {e}")
+    return index
+
+
+def build_index(records: Dict) -> Dict[str, PlayTarget]:
+    """Returns uid -> PlayTarget for every record in a records.json document."""
+    return compile_targets(
+        (uid, record.get("uri"), record.get("name"))
+        if isinstance(record, dict)
+        else (uid, None, None)
+        for uid, record in records.get("records", {}).items()
+    )
+
+
+class RecordCatalogue:
+    """Looks up what a tag plays, reloading records.json when it changes.
+
+    The index is rebuilt off to the side and swapped in with one assignment,
+    so lookup() never sees half a reload and never takes a lock. A file that
+    fails to parse, e.g. while it is being written, keeps the previous index
+    until the next change. Every `poll_interval` seconds the watcher compares
+    a JSON file's mtime and size, or a store's data_version.
+    """
+
+    def __init__(self, path: str = RECORDS_PATH, poll_interval: float = 2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._index: Dict[str, PlayTarget] = {}
+        self._store = RecordStore(path) if is_store_path(path) else None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._failed: Optional[Tuple[int, int]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, uid) -> bool:
+        return str(uid) in self._index
+
+    def lookup(self, uid) -> Optional[PlayTarget]:
+        """Returns the target uid plays, None for a tag that is not a record."""
+        return self._index.get(str(uid))
+
+    def reload(self) -> bool:
+        """Reloads the file if it changed, returns True if the index was swapped."""
+        try:
+            signature = self._stat()
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Unable to stat {self.path}: {e}")
+            return False
+        if signature in (self._signature, self._failed):
+            return False
+        try:
+            index = self._read()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # warn once, the next change of the file gets another try
+            self._failed = signature
+            logging.warning(f"Unable to load {self.path}, keeping old records: {e}")
+            return False
+        self._index = index
+        self._signature = signature
+        logging.info(f"Loaded {len(self._index)} records from {self.path}")
+        return True
+
+    def start(self) -> None:
+        """Starts watching the file as a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._store is not None:
+            self._store.close()
+
+    def _read(self) -> Dict[str, PlayTarget]:
+        if self._store is not None:
+            return compile_targets(self._store.play_rows())
+        with open(self.path, "r") as records_json:
+            return build_index(json.load(records_json))
+
+    def _stat(self) -> Tuple[int, int]:
+        if self._store is not None:
+            # the store's file only changes at checkpoints, data_version
+            # moves with every commit another process makes
+            return (self._store.data_version(), 0)
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
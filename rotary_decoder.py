@@ -0,0 +1,180 @@
+"""
+rotary_decoder.py
+
+GPIO-free decoding for RotaryEncoder. The GPIO callback only pushes the
+timestamped A/B levels of each edge into an EdgeRingBuffer, a worker thread
+runs them through the encoder state table and calls the step callbacks.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# State table of the quadrature decoder, indexed by the previous state with
+# its two low bits replaced by the new A (bit 0) and B (bit 1) levels
+TABLE = (
+    0b00000011,
+    0b00000111,
+    0b00010011,
+    0b00000011,
+    0b00001011,
+    0b00000111,
+    0b00000011,
+    0b00000011,
+    0b00001011,
+    0b00000111,
+    0b00001111,
+    0b00000011,
+    0b00001011,
+    0b00000011,
+    0b00001111,
+    0b00000001,
+    0b00010111,
+    0b00000011,
+    0b00010011,
+    0b00000011,
+    0b00010111,
+    0b00011011,
+    0b00010011,
+    0b00000011,
+    0b00010111,
+    0b00011011,
+    0b00000011,
+    0b00000010,
+)
+# states the table lands in when a detent completes
+KEY_INCR = 0b00000010
+KEY_DECR = 0b00000001
+IDLE = 0b00000011
+
+
+def decode(state: int, levels: int) -> int:
+    """Returns the state after an edge.
+
+    Parameter levels: A in bit 0 and B in bit 1, as read after the edge.
+    """
+    return TABLE[(state & ~0b11) | levels]
+
+
+class EdgeRingBuffer:
+    """Fixed-size single-producer, single-consumer queue of edges.
+
+    Slots are allocated up front and the producer and consumer each own
+    one index, so neither side takes a lock. When the consumer falls a
+    whole buffer behind, new edges are dropped and counted in `dropped`.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.dropped = 0
+        self._levels: List[int] = [0] * capacity
+        self._times: List[float] = [0.0] * capacity
+        self._head = 0  # next slot to write, only the producer moves it
+        self._tail = 0  # next slot to read, only the consumer moves it
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def push(self, levels: int, timestamp: float) -> bool:
+        """Stores an edge, returns False if the buffer is full."""
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = head % self.capacity
+        self._levels[slot] = levels
+        self._times[slot] = timestamp
+        # publish the slot only once it is filled in
+        self._head = head + 1
+        return True
+
+    def pop(self) -> Optional[Tuple[int, float]]:
+        """Returns the oldest (levels, timestamp), None if it is empty."""
+        tail = self._tail
+        if tail == self._head:
+            return None
+        slot = tail % self.capacity
+        edge = (self._levels[slot], self._times[slot])
+        self._tail = tail + 1
+        return edge
+
+
+class RotaryDecoder:
+    """Decodes the edges of one encoder on a worker thread.
+
+    Calls on_incr or on_decr with a step size that grows with spin speed,
+    like RotaryEncoder did: int(time_base / seconds since last step) + 1.
+    The time between steps comes from the edge timestamps, so a worker that
+    runs late still sizes the steps the knob made.
+    """
+
+    def __init__(
+        self,
+        on_incr: Callable[[int], None],
+        on_decr: Callable[[int], None],
+        time_base: float = 0.1,
+        capacity: int = 1024,
+        name: str = "RotaryDecoder",
+    ):
+        self.on_incr = on_incr
+        self.on_decr = on_decr
+        self.time_base = time_base
+        self.name = name
+        self.buffer = EdgeRingBuffer(capacity)
+        self.state = IDLE
+        self._last_step = time.monotonic()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def push(self, levels: int, timestamp: float) -> None:
+        """Queues an edge, cheap enough to call from a GPIO callback."""
+        self.buffer.push(levels, timestamp)
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(1.0)
+
+    def drain(self) -> int:
+        """Decodes every queued edge, returns how many steps they made."""
+        steps = 0
+        pop = self.buffer.pop
+        edge = pop()
+        while edge is not None:
+            levels, timestamp = edge
+            self.state = state = TABLE[(self.state & ~0b11) | levels]
+            if state == KEY_INCR or state == KEY_DECR:
+                steps += 1
+                self._step(state, timestamp)
+            edge = pop()
+        return steps
+
+    def _step(self, state: int, timestamp: float) -> None:
+        duration = max(timestamp - self._last_step, 1e-6)
+        self._last_step = timestamp
+        size = int(self.time_base / duration) + 1
+        if state == KEY_INCR:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"{self.name}: Calling functionIncr {size}")
+            self.on_incr(size)
+        else:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"{self.name}: Calling functionDecr {size}")
+            self.on_decr(size)
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait()
+            # clear before draining, an edge pushed meanwhile sets it again
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception:
+                logger.exception(f"{self.name}: step callback failed")
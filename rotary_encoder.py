@@ -9,26 +9,13 @@
 # https://github.com/MiczFlor/RPi-Jukebox-RFID/wiki/Audio-RotaryKnobVolume
 
 import RPi.GPIO as GPIO
-from timeit import default_timer as timer
-import ctypes
 import logging
+import time
 from signal import pause
 
-logger = logging.getLogger(__name__)
-
-c_uint8 = ctypes.c_uint8
-
-
-class Flags_bits(ctypes.LittleEndianStructure):
-    _fields_ = [
-        ("A", c_uint8, 1),  # asByte & 1
-        ("B", c_uint8, 1),  # asByte & 2
-    ]
-
+from rotary_decoder import TABLE, RotaryDecoder
 
-class Flags(ctypes.Union):
-    _anonymous_ = ("bit",)
-    _fields_ = [("bit", Flags_bits), ("asByte", c_uint8)]
+logger = logging.getLogger(__name__)
 
 
 class RotaryEncoder:
@@ -36,36 +23,7 @@ class RotaryEncoder:
     KeyIncr = 0b00000010
     KeyDecr = 0b00000001
 
-    tblEncoder = [
-        0b00000011,
-        0b00000111,
-        0b00010011,
-        0b00000011,
-        0b00001011,
-        0b00000111,
-        0b00000011,
-        0b00000011,
-        0b00001011,
-        0b00000111,
-        0b00001111,
-        0b00000011,
-        0b00001011,
-        0b00000011,
-        0b00001111,
-        0b00000001,
-        0b00010111,
-        0b00000011,
-        0b00010011,
-        0b00000011,
-        0b00010111,
-        0b00011011,
-        0b00010011,
-        0b00000011,
-        0b00010111,
-        0b00011011,
-        0b00000011,
-        0b00000010,
-    ]
+    tblEncoder = TABLE
 
     def __init__(
         self,
@@ -75,6 +33,7 @@ class RotaryEncoder:
         functionCallDecr=None,
         timeBase=0.1,
         name="RotaryEncoder",
+        hub=None,
     ):
         logger.debug(
             "Initialize {name} RotaryEncoder({arg_Apin}, {arg_Bpin})".format(
@@ -89,12 +48,18 @@ class RotaryEncoder:
         self.functionCallbackDecr = functionCallDecr
         self.timeBase = timeBase
 
-        self.encoderState = Flags()  # stores the encoder state machine state
-        self.startTime = timer()
+        # with a gpio_hub.GpioHub every edge comes with its level and kernel
+        # timestamp, the level of the other pin is the last one it reported
+        self.hub = hub
+        self._levels = {}
 
         # setup pins
-        GPIO.setup(self.pinA, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(self.pinB, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        if self.hub is not None:
+            self.hub.setup(self.pinA)
+            self.hub.setup(self.pinB)
+        else:
+            GPIO.setup(self.pinA, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.setup(self.pinB, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         self._is_active = False
         self.start()
 
@@ -115,13 +80,36 @@ class RotaryEncoder:
     def start(self):
         logger.debug("Start Event Detection on {} and {}".format(self.pinA, self.pinB))
         self._is_active = True
+        # the GPIO callback only records edges, the decoder's worker thread
+        # decodes them and calls the functions, every start gets its own
+        # worker and stop() ends it
+        self.decoder = RotaryDecoder(
+            on_incr=self.functionCallbackIncr,
+            on_decr=self.functionCallbackDecr,
+            time_base=self.timeBase,
+            name=self.name,
+        )
+        if self.hub is not None:
+            # both levels are known before the first edge of either pin, the
+            # lines are requested again after a stop()
+            for pin in (self.pinA, self.pinB):
+                self.hub.setup(pin)
+                self._levels[pin] = self.hub.value(pin)
+            for pin in (self.pinA, self.pinB):
+                self.hub.add_input(pin, self._HubCallback)
+            return
         GPIO.add_event_detect(self.pinA, GPIO.BOTH, callback=self._Callback)
         GPIO.add_event_detect(self.pinB, GPIO.BOTH, callback=self._Callback)
 
     def stop(self):
         logger.debug("Stop Event Detection on {} and {}".format(self.pinA, self.pinB))
-        GPIO.remove_event_detect(self.pinA)
-        GPIO.remove_event_detect(self.pinB)
+        if self.hub is not None:
+            self.hub.remove_input(self.pinA)
+            self.hub.remove_input(self.pinB)
+        else:
+            GPIO.remove_event_detect(self.pinA)
+            GPIO.remove_event_detect(self.pinB)
+        self.decoder.stop()
         self._is_active = False
 
     def __del__(self):
@@ -132,49 +120,18 @@ class RotaryEncoder:
     def is_active(self):
         return self._is_active
 
-    def _StepSize(self):
-        end = timer()
-        duration = end - self.startTime
-        self.startTime = end
-        return int(self.timeBase / duration) + 1
-
     def _Callback(self, pin):
-        logger.debug("EventDetection Called")
-        # construct new state machine input from encoder state and old state
-        statusA = GPIO.input(self.pinA)
-        statusB = GPIO.input(self.pinB)
-
-        self.encoderState.A = statusA
-        self.encoderState.B = statusB
-        logger.debug(
-            'new encoderState: "{}" -> {}, {},{}'.format(
-                self.encoderState.asByte,
-                self.tblEncoder[self.encoderState.asByte],
-                statusA,
-                statusB,
-            )
-        )
-        current_state = self.encoderState.asByte
-        self.encoderState.asByte = self.tblEncoder[current_state]
-
-        if self.KeyIncr == self.encoderState.asByte:
-            steps = self._StepSize()
-            logger.info(
-                "{name}: Calling functionIncr {steps}".format(
-                    name=self.name, steps=steps
-                )
-            )
-            self.functionCallbackIncr(steps)
-        elif self.KeyDecr == self.encoderState.asByte:
-            steps = self._StepSize()
-            logger.info(
-                "{name}: Calling functionDecr {steps}".format(
-                    name=self.name, steps=steps
-                )
-            )
-            self.functionCallbackDecr(steps)
-        else:
-            logger.debug('Ignoring encoderState: "{}"'.format(self.encoderState.asByte))
+        # runs for every edge on the shared GPIO thread, so it only reads the
+        # levels and queues them with the time they were seen
+        levels = GPIO.input(self.pinA) | (GPIO.input(self.pinB) << 1)
+        self.decoder.push(levels, time.monotonic())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Edge on {pin}: levels {levels:02b}")
+
+    def _HubCallback(self, edge):
+        self._levels[edge.pin] = edge.level
+        levels = self._levels[self.pinA] | (self._levels[self.pinB] << 1)
+        self.decoder.push(levels, edge.timestamp)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,9 @@ from signal import pause
 import logging
 import RPi.GPIO as GPIO
 
+from debounce import DEBOUNCE_WINDOW, DebouncedInput
+from hold_scheduler import HOLD_MODES, HoldDetector
+
 GPIO.setmode(GPIO.BOARD)
 
 logger = logging.getLogger(__name__)
@@ -62,28 +65,6 @@ def print_pull_up_down(pull_up_down):
     return result
 
 
-# This function takes a holding time (fractional seconds), a channel, a GPIO state and an action reference (function).
-# It checks if the GPIO is in the state since the function was called. If the state
-# changes it return False. If the time is over the function returns True.
-def checkGpioStaysInState(holdingTime, gpioChannel, gpioHoldingState):
-    # Get a reference start time (https://docs.python.org/3/library/time.html#time.perf_counter)
-    startTime = time.perf_counter()
-    # Continously check if time is not over
-    while True:
-        time.sleep(0.1)
-        currentState = GPIO.input(gpioChannel)
-        if holdingTime < (time.perf_counter() - startTime):
-            break
-        # Return if state does not match holding state
-        if gpioHoldingState != currentState:
-            return False
-        # Else: Wait
-
-    if gpioHoldingState != currentState:
-        return False
-    return True
-
-
 class SimpleButton:
     def __init__(
         self,
@@ -91,12 +72,15 @@ class SimpleButton:
         action=lambda *args: None,
         action2=lambda *args: None,
         name=None,
-        bouncetime=500,
+        bouncetime=None,
         antibouncehack=False,
         edge="falling",
         hold_time=0.3,
         hold_mode=None,
         pull_up_down="pull_up",
+        scheduler=None,
+        debounce_window=DEBOUNCE_WINDOW,
+        hub=None,
     ):
         self.edge = parse_edge_key(edge)
         self.hold_time = hold_time
@@ -108,17 +92,86 @@ class SimpleButton:
         self.name = name
         self.bouncetime = bouncetime
         self.antibouncehack = antibouncehack
-        GPIO.setup(self.pin, GPIO.IN, pull_up_down=self.pull_up_down)
+        # a gpio_hub.GpioHub watches the pin instead of RPi.GPIO, it only
+        # reports edges, so the button is always debounced in software
+        self.hub = hub
+        if self.hub is not None and self.bouncetime is not None:
+            logger.warning(f"{self.name}: bouncetime needs RPi.GPIO, debouncing")
+            self.bouncetime = None
+        if self.hub is not None:
+            self.hub.setup(self.pin, pull=print_pull_up_down(self.pull_up_down))
+        else:
+            GPIO.setup(self.pin, GPIO.IN, pull_up_down=self.pull_up_down)
         self._action = action
         self._action2 = action2
-        GPIO.add_event_detect(
-            self.pin,
-            edge=self.edge,
-            callback=self.callbackFunctionHandler,
-            bouncetime=self.bouncetime,
-        )
+        # hold modes run on timers of the shared scheduler, never on the GPIO
+        # callback thread
+        self._hold = None
+        if self.hold_mode in HOLD_MODES:
+            self._hold = HoldDetector(
+                self.hold_mode,
+                self.hold_time,
+                is_held=lambda: self._read() == GPIO.LOW,
+                on_press=lambda *args: self.when_pressed(*args),
+                on_hold=lambda *args: self.when_held(*args),
+                scheduler=scheduler,
+                name=self.name,
+                # with a bouncetime RPi.GPIO reports presses only, so the pin
+                # is sampled during a hold like the old sleep loop did
+                sample_interval=0.1 if self.bouncetime is not None else None,
+            )
+        # without a bouncetime RPi.GPIO reports every edge and a press only
+        # counts once the level has settled for debounce_window seconds
+        self._debounced = None
+        if self.bouncetime is None:
+            self._debounced = DebouncedInput(
+                read_level=self._read,
+                on_change=self._levelChanged,
+                window=debounce_window,
+                scheduler=scheduler,
+                name=self.name,
+            )
+        self._addEventDetect()
         self.callback_with_pin_argument = False
 
+    def _read(self):
+        if self.hub is not None:
+            return self.hub.value(self.pin)
+        return GPIO.input(self.pin)
+
+    def _addEventDetect(self):
+        if self.hub is not None:
+            self.hub.add_input(
+                self.pin,
+                lambda edge: self._debounced.update(edge.level),
+                pull=print_pull_up_down(self.pull_up_down),
+            )
+        elif self._debounced is not None:
+            GPIO.add_event_detect(
+                self.pin, edge=GPIO.BOTH, callback=self._debounced.edge
+            )
+        else:
+            GPIO.add_event_detect(
+                self.pin,
+                edge=self.edge,
+                callback=self.callbackFunctionHandler,
+                bouncetime=self.bouncetime,
+            )
+
+    def _removeEventDetect(self):
+        if self.hub is not None:
+            self.hub.remove_input(self.pin)
+        else:
+            GPIO.remove_event_detect(self.pin)
+
+    def _levelChanged(self, level):
+        # the level a press settles at, falling edges press towards LOW
+        pressed_level = GPIO.HIGH if self.edge == GPIO.RISING else GPIO.LOW
+        if self.edge == GPIO.BOTH or level == pressed_level:
+            self.callbackFunctionHandler()
+        elif self._hold is not None:
+            self._hold.released()
+
     def callbackFunctionHandler(self, *args):
         if (
             len(args) > 0
@@ -133,13 +186,14 @@ class SimpleButton:
             args = args[1:]
             logger.debug("args after: {}".format(args))
 
-        if self.antibouncehack:
+        # a debounced level has been checked already
+        if self.antibouncehack and self._debounced is None:
             time.sleep(0.1)
             inval = GPIO.input(self.pin)
             if inval != GPIO.LOW:
                 return None
 
-        if self.hold_mode in ("Repeat", "Postpone", "SecondFunc", "SecondFuncRepeat"):
+        if self._hold is not None:
             return self.longPressHandler(*args)
         else:
             logger.info("{}: execute callback".format(self.name))
@@ -160,58 +214,31 @@ class SimpleButton:
         logger.info("{}: set when_pressed")
         self._action = func
 
-        GPIO.remove_event_detect(self.pin)
+        self._removeEventDetect()
         logger.info("add new action")
-        GPIO.add_event_detect(
-            self.pin,
-            edge=self.edge,
-            callback=self.callbackFunctionHandler,
-            bouncetime=self.bouncetime,
-        )
+        self._addEventDetect()
 
     def set_callbackFunction(self, callbackFunction):
         self.when_pressed = callbackFunction
 
     def longPressHandler(self, *args):
         logger.info("{}: longPressHandler, mode: {}".format(self.name, self.hold_mode))
-        # instant action (except Postpone mode)
-        if self.hold_mode != "Postpone":
-            self.when_pressed(*args)
-
-        # action(s) after hold_time
-        if self.hold_mode == "Repeat":
-            # Repeated call of main action (multiple times if button is held long enough)
-            while checkGpioStaysInState(self.hold_time, self.pin, GPIO.LOW):
-                self.when_pressed(*args)
-
-        elif self.hold_mode == "Postpone":
-            # Postponed call of main action (once)
-            if checkGpioStaysInState(self.hold_time, self.pin, GPIO.LOW):
-                self.when_pressed(*args)
-            while checkGpioStaysInState(self.hold_time, self.pin, GPIO.LOW):
-                pass
-
-        elif self.hold_mode == "SecondFunc":
-            # Call of secondary action (once)
-            if checkGpioStaysInState(self.hold_time, self.pin, GPIO.LOW):
-                self.when_held(*args)
-            while checkGpioStaysInState(self.hold_time, self.pin, GPIO.LOW):
-                pass
-
-        elif self.hold_mode == "SecondFuncRepeat":
-            # Repeated call of secondary action (multiple times if button is held long enough)
-            while checkGpioStaysInState(self.hold_time, self.pin, GPIO.LOW):
-                self.when_held(*args)
+        # instant action (except Postpone mode), the rest once hold_time is up
+        self._hold.pressed(*args)
+
+    def close(self):
+        """Stops watching the pin, for a runtime shutting down in order."""
+        self._removeEventDetect()
 
     def __del__(self):
         logger.debug("remove event detection")
-        GPIO.remove_event_detect(self.pin)
+        self._removeEventDetect()
 
     @property
     def is_pressed(self):
         if self.pull_up:
-            return not GPIO.input(self.pin)
-        return GPIO.input(self.pin)
+            return not self._read()
+        return self._read()
 
     def __repr__(self):
         return "<SimpleButton-{}(pin={},edge={},hold_mode={},hold_time={},bouncetime={},antibouncehack={},pull_up_down={})>".format(
@@ -0,0 +1,86 @@
+"""
+spotify_auth.py
+
+Owns the Spotify OAuth state for the jukebox and update_records. The cached
+token is read from disk once and then kept in memory; the client and the
+refresher share that single copy.
+"""
+
+import logging
+import os
+from typing import Dict, Optional
+
+import spotipy
+from dotenv import load_dotenv
+from spotipy.oauth2 import CacheFileHandler, SpotifyOAuth
+
+# Initialize
+load_dotenv()
+CLIENT_ID = os.environ.get("CLIENT_ID")
+CLIENT_SECRET = os.environ.get("CLIENT_SECRET")
+REDIRECT_URI = "http://127.0.0.1:7070"
+
+SCOPE = (
+    "user-read-playback-state,user-modify-playback-state,playlist-read-private,"
+    + "playlist-read-collaborative,user-read-currently-playing,user-read-private,"
+    + "user-library-read,user-read-playback-position"
+)
+
+
+class SpotifyAuth:
+    """One OAuth manager, one in-memory token and one client built on it.
+
+    Parameter username: integer found in Spotify profile, names the cache file.
+    Will request authentication at REDIRECT_URI if not logged in before.
+    """
+
+    def __init__(self, username, scope: str = SCOPE):
+        self.username = username
+        self.oauth = SpotifyOAuth(
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            redirect_uri=REDIRECT_URI,
+            scope=scope,
+            cache_handler=CacheFileHandler(username=str(username)),
+        )
+        self.token_info = self._load_token()
+        self._client: Optional[spotipy.client.Spotify] = None
+
+    @property
+    def expires_at(self) -> float:
+        return self.token_info["expires_at"]
+
+    def client(self) -> spotipy.client.Spotify:
+        """Returns the shared client, building it on first use."""
+        if self._client is None:
+            self._client = spotipy.Spotify(
+                auth=self.token_info["access_token"],
+                client_credentials_manager=self.oauth,
+            )
+        return self._client
+
+    def refresh(self) -> Dict:
+        """Refreshes the token and hands it to the client, returns the token info.
+
+        The oauth manager also writes it to the cache file for the next start.
+        """
+        logging.info("Refreshing spotify token...")
+        token_info = self.oauth.refresh_access_token(self.token_info["refresh_token"])
+        self.token_info = token_info
+        if self._client is not None:
+            self._client.set_auth(token_info["access_token"])
+        return token_info
+
+    def _load_token(self) -> Dict:
+        # validate_token refreshes an expired token, so this is a single
+        # cache read plus, at most, one refresh
+        token_info = self.oauth.validate_token(
+            self.oauth.cache_handler.get_cached_token()
+        )
+        if token_info is None:
+            # first run on this box, authorize in the browser
+            code = self.oauth.get_auth_response()
+            self.oauth.get_access_token(code, as_dict=False, check_cache=False)
+            token_info = self.oauth.cache_handler.get_cached_token()
+        logging.debug(f"Token successfully created/refreshed for {self.username}.")
+        return token_info
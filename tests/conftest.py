@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the jukebox modules sit at the top of the repository, like for benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
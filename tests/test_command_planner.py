@@ -0,0 +1,88 @@
+"""Every FSM_jukebox transition sends as many Web API calls as EXPECTED_CALLS."""
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from threading import Lock
+
+import pytest
+
+pytest.importorskip("spotipy")
+
+from command_planner import (  # noqa: E402
+    EXPECTED_CALLS,
+    PAUSED,
+    PLAYING,
+    STOPPED,
+    TAG,
+    execute,
+    plan,
+)
+from records import PlayTarget  # noqa: E402
+
+TARGET = PlayTarget("spotify:album:6EdweDU5TYn4mv2t2ZWmJ9")
+
+
+class StubClient:
+    """Records the spotipy.Spotify calls execute() makes, sends nothing."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = Lock()
+
+    def __getattr__(self, method):
+        def call(**kwargs):
+            with self._lock:
+                self.calls.append((method, kwargs))
+
+        return call
+
+
+@pytest.mark.parametrize(
+    "state, command, active",
+    [key + (active,) for key, active in product(EXPECTED_CALLS, (True, False))],
+)
+def test_transition_sends_expected_calls(state, command, active):
+    expected = EXPECTED_CALLS[state, command][0 if active else 1]
+    if command == TAG:
+        result = plan(state, "play/pause", TARGET, device_id="box", active=active)
+    else:
+        result = plan(state, command, device_id="box", active=active)
+    sp = StubClient()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        execute(result, sp, executor)
+    assert result.call_count == expected
+    assert len(sp.calls) == expected
+    assert all(kwargs["device_id"] == "box" for _, kwargs in sp.calls)
+
+
+def test_tag_plays_its_target():
+    sp = StubClient()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        execute(plan(PLAYING, "play/pause", TARGET, active=False), sp, executor)
+    assert sp.calls == [
+        ("start_playback", {"device_id": None, **TARGET.play_kwargs()}),
+    ]
+
+
+@pytest.mark.parametrize("state", [STOPPED, PLAYING, PAUSED])
+@pytest.mark.parametrize("active", [True, False])
+def test_only_start_playback_claims_the_active_device(state, active):
+    assert plan(state, "randomize", active=active).active is None
+    assert plan(state, "play/pause", TARGET, active=active).active is True
+    for command in ("play/pause", "stop", "forward", "reverse"):
+        result = plan(state, command, active=active)
+        if result.call_count:
+            assert result.active is True
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+        "spotify:episode:512ojhOuo1ktJprKbVcKyQ",
+        "spotify:album:6EdweDU5TYn4mv2t2ZWmJ9",
+    ],
+)
+def test_bare_uri_plays_like_its_target(uri):
+    target = plan(STOPPED, "play/pause", PlayTarget(uri))
+    assert plan(STOPPED, "play/pause", uri) == target
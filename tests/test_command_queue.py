@@ -0,0 +1,49 @@
+"""InputEnqueuer hands a full queue's backlog over in order."""
+
+import queue
+import time
+
+from command_queue import COALESCE, InputEnqueuer
+
+
+def wait_for(predicate, timeout: float = 1.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def commands(messages) -> list:
+    received = []
+    while True:
+        try:
+            received.append(messages.get(timeout=0.5)[0])
+        except queue.Empty:
+            return received
+
+
+def test_later_press_never_overtakes_the_backlog():
+    messages = queue.Queue(maxsize=1)
+    enqueuer = InputEnqueuer(messages, policy=COALESCE, retry_interval=0.05)
+    enqueuer.put(("stop", ""))
+    enqueuer.put(("forward", ""))
+    # the flush thread is now putting forward and waits for room
+    assert wait_for(lambda: enqueuer._in_flight)
+    enqueuer.put(("reverse", ""))
+    assert messages.get(timeout=1)[0] == ("stop", "")
+    assert commands(messages) == [("forward", ""), ("reverse", "")]
+
+
+def test_press_in_flight_is_not_cancelled_out():
+    messages = queue.Queue(maxsize=1)
+    enqueuer = InputEnqueuer(messages, policy=COALESCE, retry_interval=5)
+    enqueuer.put(("stop", ""))
+    enqueuer.put(("play/pause", ""))
+    assert wait_for(lambda: enqueuer._in_flight)
+    # would cancel the first play/pause if it were still only held
+    enqueuer.put(("play/pause", ""))
+    assert messages.get(timeout=1)[0] == ("stop", "")
+    assert commands(messages) == [("play/pause", ""), ("play/pause", "")]
+    assert enqueuer.stats()["dropped"] == 0
@@ -0,0 +1,54 @@
+"""DebouncedInput accepts a level only if the pin still reads it."""
+
+import threading
+
+from debounce import DebouncedInput, StableWindowDebouncer
+from hold_scheduler import HoldScheduler
+
+WINDOW = 0.005
+
+
+def test_bounce_inside_the_window_is_ignored():
+    debouncer = StableWindowDebouncer(1, WINDOW)
+    assert debouncer.edge(0, 1.0) == 1.0 + WINDOW
+    debouncer.edge(1, 1.001)
+    debouncer.edge(0, 1.002)
+    assert debouncer.settle(1.0 + WINDOW) is None
+    assert debouncer.settle(1.002 + WINDOW) == 0
+
+
+def test_settle_rejects_a_level_the_pin_left():
+    debouncer = StableWindowDebouncer(1, WINDOW)
+    debouncer.edge(0, 1.0)
+    # the release edge was lost, the pin reads high again
+    assert debouncer.settle(1.0 + WINDOW, level=1) is None
+    assert debouncer.level == 1
+    assert debouncer.due is None
+
+
+def test_missed_edge_is_not_reported():
+    pin = {"level": 1}
+    changes = []
+    changed = threading.Event()
+    scheduler = HoldScheduler()
+
+    def on_change(level):
+        changes.append(level)
+        changed.set()
+
+    try:
+        debounced = DebouncedInput(
+            lambda: pin["level"], on_change, window=WINDOW, scheduler=scheduler
+        )
+        # a press whose release edge never arrives
+        pin["level"] = 0
+        debounced.update(0)
+        pin["level"] = 1
+        assert not changed.wait(WINDOW * 10)
+
+        pin["level"] = 0
+        debounced.update(0)
+        assert changed.wait(1.0)
+        assert changes == [0]
+    finally:
+        scheduler.stop()
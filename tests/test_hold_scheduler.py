@@ -0,0 +1,133 @@
+"""Presses on other pins are served promptly while a button is held."""
+
+import queue
+import threading
+import time
+
+from hold_scheduler import HOLD_MODES, HoldDetector, HoldScheduler
+
+HOLD_TIME = 0.05
+HELD_FOR = 0.5
+PRESS_INTERVAL = 0.01
+# far below HOLD_TIME, the sleep loop kept B waiting for all of HELD_FOR
+MAX_LATENCY = 0.03
+
+
+def press_latencies(mode: str) -> list:
+    """Holds A in mode and presses B on one shared callback thread.
+
+    Returns how long each of B's presses waited for its action.
+    """
+    scheduler = HoldScheduler()
+    held = {"A": True}
+    edges = queue.Queue()
+    latencies = []
+    a_actions = []
+
+    a = HoldDetector(
+        mode,
+        HOLD_TIME,
+        is_held=lambda: held["A"],
+        on_press=lambda: a_actions.append(time.monotonic()),
+        on_hold=lambda: a_actions.append(time.monotonic()),
+        scheduler=scheduler,
+    )
+    b = HoldDetector(
+        "SecondFunc",
+        HOLD_TIME,
+        is_held=lambda: False,
+        on_press=lambda sent: latencies.append(time.monotonic() - sent),
+        on_hold=lambda sent: None,
+        scheduler=scheduler,
+    )
+
+    # stands in for RPi.GPIO's callback thread, which every pin shares
+    def callbacks() -> None:
+        while True:
+            edge = edges.get()
+            if edge is None:
+                return
+            edge()
+
+    thread = threading.Thread(target=callbacks)
+    thread.start()
+    try:
+        edges.put(a.pressed)
+        deadline = time.monotonic() + HELD_FOR
+        while time.monotonic() < deadline:
+            edges.put(lambda sent=time.monotonic(): b.pressed(sent))
+            time.sleep(PRESS_INTERVAL)
+        held["A"] = False
+        a.released()
+    finally:
+        edges.put(None)
+        thread.join(5)
+        scheduler.stop()
+    assert a_actions, f"{mode}: A never acted"
+    return latencies
+
+
+def test_presses_are_not_held_up_by_a_held_button():
+    for mode in HOLD_MODES:
+        latencies = press_latencies(mode)
+        assert len(latencies) >= HELD_FOR / PRESS_INTERVAL / 2
+        assert max(latencies) < MAX_LATENCY, f"{mode}: {max(latencies):.3f}s"
+
+
+def unreported_repress(sample_interval) -> list:
+    """Presses, releases and presses again without a second press edge.
+
+    Returns the holds fired, like RPi.GPIO's bouncetime swallowing the
+    second press.
+    """
+    scheduler = HoldScheduler()
+    held = {"A": True}
+    holds = []
+    a = HoldDetector(
+        "SecondFunc",
+        HOLD_TIME * 4,
+        is_held=lambda: held["A"],
+        on_press=lambda: None,
+        on_hold=lambda: holds.append(time.monotonic()),
+        scheduler=scheduler,
+        sample_interval=sample_interval,
+    )
+    try:
+        a.pressed()
+        time.sleep(HOLD_TIME)
+        held["A"] = False
+        time.sleep(HOLD_TIME)
+        held["A"] = True
+        time.sleep(HOLD_TIME * 4)
+    finally:
+        scheduler.stop()
+    return holds
+
+
+def test_sampling_ends_a_hold_released_in_between():
+    assert unreported_repress(sample_interval=HOLD_TIME / 5) == []
+
+
+def test_without_sampling_only_the_deadline_counts():
+    assert len(unreported_repress(sample_interval=None)) == 1
+
+
+def test_sampling_keeps_the_repeat_rhythm():
+    scheduler = HoldScheduler()
+    presses = []
+    a = HoldDetector(
+        "Repeat",
+        HOLD_TIME,
+        is_held=lambda: True,
+        on_press=lambda: presses.append(time.monotonic()),
+        on_hold=lambda: None,
+        scheduler=scheduler,
+        sample_interval=HOLD_TIME / 3,
+    )
+    try:
+        a.pressed()
+        time.sleep(HOLD_TIME * 3.5)
+        a.released()
+    finally:
+        scheduler.stop()
+    assert len(presses) == 4
@@ -0,0 +1,57 @@
+"""VolumeApplier only reports a volume applied once the mixer took it."""
+
+import time
+
+import pytest
+
+from mixer import FakeMixer, VolumeApplier
+
+
+class FlakyMixer(FakeMixer):
+    """Fails the first `failures` writes."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def set_volume(self, vol: int) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise OSError("mixer busy")
+        super().set_volume(vol)
+
+
+@pytest.fixture
+def flaky():
+    mixer = FlakyMixer(failures=1)
+    applier = VolumeApplier(mixer, max_rate=100, retry_delay=0.2)
+    yield mixer, applier
+    applier.close()
+
+
+def test_failed_write_is_not_applied_and_is_retried(flaky):
+    mixer, applier = flaky
+    applier.set(30)
+    assert not applier.wait_applied(0.1)
+    assert applier.wait_applied(1.0)
+    assert mixer.volumes == [30]
+    assert applier.writes == 1
+
+
+def test_new_target_retries_at_once(flaky):
+    mixer, applier = flaky
+    applier.set(30)
+    assert not applier.wait_applied(0.05)
+    applier.set(40)
+    assert applier.wait_applied(0.1)
+    assert mixer.volumes == [40]
+
+
+def test_close_gives_up_on_a_failing_mixer():
+    mixer = FlakyMixer(failures=100)
+    applier = VolumeApplier(mixer, retry_delay=10)
+    applier.set(30)
+    started = time.monotonic()
+    applier.close(timeout=5)
+    assert time.monotonic() - started < 1.0
+    assert mixer.volumes == []
@@ -0,0 +1,30 @@
+"""PlayTarget payloads are compiled once and cannot be changed."""
+
+import pytest
+
+pytest.importorskip("dotenv")
+
+from records import PlayTarget  # noqa: E402
+
+
+def test_items_play_as_uris_and_the_rest_as_a_context():
+    episode = "spotify:episode:512ojhOuo1ktJprKbVcKyQ"
+    assert PlayTarget(episode).play_kwargs() == {"uris": [episode]}
+    album = "spotify:album:6EdweDU5TYn4mv2t2ZWmJ9"
+    assert PlayTarget(album).play_kwargs() == {"context_uri": album}
+
+
+def test_payload_is_immutable():
+    target = PlayTarget("spotify:track:4uLU6hMCjMI75M1A2tKUQC")
+    with pytest.raises(TypeError):
+        target.payload["uris"] = []
+    with pytest.raises(AttributeError):
+        target.payload["uris"].append("spotify:track:other")
+    # what spotipy gets is a copy
+    target.play_kwargs()["uris"].append("spotify:track:other")
+    assert target.play_kwargs() == {"uris": [target.uri]}
+
+
+def test_unplayable_uri_is_rejected():
+    with pytest.raises(ValueError):
+        PlayTarget("spotify:track:short")
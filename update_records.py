@@ -1,58 +1,332 @@
+"""
+update_records.py
+
+Refreshes the name, cover and uri of every record from Spotify and stores
+the covers in the album_art ArtStore. Albums and tracks are fetched through
+the multi-id endpoints, playlists and covers concurrently on a small thread
+pool.
+
+Runs are incremental: a sync cache remembers what every record looked like
+after its last refresh, and records that cannot have changed since are
+skipped. Pass --full to refresh every record regardless.
+"""
+
+import argparse
 import json
+import logging
 import os
-import shutil
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import spotipy
 
-from jukebox import spotipy_instance
+from album_art import ArtStore
+from record_store import RecordStore, is_store_path
+from records import RECORDS_PATH
+from spotify_auth import SpotifyAuth
+
+# the most ids the multi-id endpoints take in one request
+BATCH_SIZES = {"album": 20, "track": 50}
+# a playlist otherwise comes back with its first hundred tracks
+PLAYLIST_FIELDS = "name,images,uri,snapshot_id"
+WORKERS = 8
+SYNC_CACHE_PATH = "./.records_sync.json"
+
+
+def record_kind(url: str) -> str:
+    """Returns album, playlist or track for a record's Spotify url."""
+    if "album" in url:
+        return "album"
+    if "playlist" in url:
+        return "playlist"
+    return "track"
+
+
+def chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class Progress:
+    """Logs how far a stage of `total` items got, every `every` items."""
+
+    def __init__(self, stage: str, total: int, every: int = 50):
+        self.stage = stage
+        self.total = total
+        self.every = every
+        self.done = 0
+        self._lock = threading.Lock()
+
+    def step(self, count: int = 1) -> None:
+        with self._lock:
+            before = self.done
+            self.done += count
+            crossed = self.done // self.every > before // self.every
+            if crossed or self.done == self.total:
+                logging.info(f"{self.stage}: {self.done}/{self.total}")
+
+
+class SyncCache:
+    """What every record looked like after its last successful refresh.
+
+    Keeps a fingerprint per record: its url, uri, cover url and a playlist's
+    snapshot_id. A record Spotify has no cover for is fingerprinted without
+    one. Saved as JSON at `path` and replaced in one step.
+    """
+
+    def __init__(self, path: str = SYNC_CACHE_PATH):
+        self.path = path
+        try:
+            with open(path, "r") as cache_json:
+                self._entries: Dict[str, Dict] = json.load(cache_json)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def fingerprint(item: Dict, snapshot_id: Optional[str] = None) -> List:
+        return [item.get("url"), item.get("uri"), item.get("image_url"), snapshot_id]
+
+    def unchanged(
+        self,
+        key: str,
+        item: Dict,
+        cover: Optional[str],
+        snapshot_id: Optional[str] = None,
+    ) -> bool:
+        """Returns True if key still matches its fingerprint and has its cover.
+
+        Parameter cover: the stored cover of key, None if there is none.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        # a cover url without a stored cover means its download failed
+        if cover is None and item.get("image_url"):
+            return False
+        return entry["fingerprint"] == self.fingerprint(item, snapshot_id)
+
+    def update(self, key: str, item: Dict, snapshot_id: Optional[str] = None) -> None:
+        self._entries[key] = {"fingerprint": self.fingerprint(item, snapshot_id)}
+
+    def save(self) -> None:
+        with open(self.path + ".tmp", "w") as outfile:
+            json.dump(self._entries, outfile)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def apply_details(item: Dict, kind: str, details: Dict) -> None:
+    """Copies name, cover url and uri from a Spotify object into item."""
+    item["name"] = details["name"]
+    images = details["album"]["images"] if kind == "track" else details["images"]
+    if images:
+        item["image_url"] = images[0]["url"]
+    item["uri"] = details["uri"]
+
+
+def _fetch_batch(sp: spotipy.client.Spotify, kind: str, urls: List[str]) -> List:
+    if kind == "album":
+        return sp.albums(urls)["albums"]
+    return sp.tracks(urls)["tracks"]
+
+
+def fetch_metadata(
+    sp: spotipy.client.Spotify,
+    records: Dict[str, Dict],
+    keys: List[str],
+    executor: Executor,
+) -> Dict[str, Dict]:
+    """Updates the records in keys in place from Spotify.
+
+    Returns key -> the Spotify object for every record Spotify answered for.
+    """
+    by_kind: Dict[str, List[str]] = {"album": [], "playlist": [], "track": []}
+    for key in keys:
+        by_kind[record_kind(records[key].get("url"))].append(key)
+
+    jobs = {}
+    for kind, size in BATCH_SIZES.items():
+        for batch in chunks(by_kind[kind], size):
+            urls = [records[key]["url"] for key in batch]
+            jobs[executor.submit(_fetch_batch, sp, kind, urls)] = (kind, batch)
+    for key in by_kind["playlist"]:
+        future = executor.submit(sp.playlist, records[key]["url"], PLAYLIST_FIELDS)
+        jobs[future] = ("playlist", [key])
+
+    progress = Progress("Metadata", len(keys))
+    fetched = {}
+    for future in as_completed(jobs):
+        kind, batch = jobs[future]
+        try:
+            results = future.result()
+        except (spotipy.SpotifyException, requests.RequestException) as e:
+            logging.warning(f"Unable to fetch {kind} for {batch}: {e}")
+            progress.step(len(batch))
+            continue
+        if kind == "playlist":
+            results = [results]
+        for key, details in zip(batch, results):
+            # the multi-id endpoints answer null for an id they do not know
+            if details is None:
+                logging.warning(f"Spotify has no {kind} for record {key}")
+                continue
+            apply_details(records[key], kind, details)
+            fetched[key] = details
+        progress.step(len(batch))
+    return fetched
+
+
+def download_images(
+    records: Dict[str, Dict],
+    keys: List[str],
+    art: ArtStore,
+    executor: Executor,
+    workers: int = WORKERS,
+) -> List[str]:
+    """Stores the cover of every record in keys, returns the keys now linked.
+
+    Records sharing a cover url share one download.
+    """
+    session = requests.Session()
+    # keep a connection per worker alive to the image host
+    adapter = HTTPAdapter(pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    by_url: Dict[str, List[str]] = {}
+    for key in keys:
+        url = records[key].get("image_url")
+        if url:
+            by_url.setdefault(url, []).append(key)
+    jobs = {executor.submit(art.fetch, session, url): url for url in by_url}
+
+    progress = Progress("Covers", len(jobs))
+    received = art.received
+    linked = []
+    for future in as_completed(jobs):
+        url = jobs[future]
+        try:
+            relative = future.result()
+        except (OSError, requests.RequestException) as e:
+            logging.warning(f"Unable to save cover {url}: {e}")
+            relative = None
+        if relative is not None:
+            for key in by_url[url]:
+                art.link(key, records[key].get("name", ""), url, relative)
+                linked.append(key)
+        progress.step()
+    session.close()
+    logging.info(
+        f"Covers: {art.received - received} bytes received for {len(jobs)} covers"
+    )
+    return linked
+
+
+def refresh_records(
+    sp: spotipy.client.Spotify,
+    records: Dict[str, Dict],
+    art: Optional[ArtStore] = None,
+    workers: int = WORKERS,
+    cache: Optional[SyncCache] = None,
+    full: bool = False,
+) -> List[str]:
+    """Refreshes records in place, stores their covers and thumbnails.
+
+    Parameter art: the store covers go to, ./album_art/ by default.
+    Parameter cache: skips records it shows unchanged and is updated with
+        every record refreshed. Without one every record is refreshed.
+    Parameter full: refresh every record even if the cache has it, covers
+        are still only downloaded again if the server says they changed.
+    Returns the keys of the records that changed, for a full run too only
+    those whose details or fingerprint differ from before.
+    """
+    art = art or ArtStore()
+
+    def unchanged(key: str, snapshot_id: Optional[str] = None) -> bool:
+        return cache.unchanged(key, records[key], art.cover(key), snapshot_id)
+
+    keys = list(records)
+    if cache is not None and not full:
+        # albums and tracks do not change under the same url, a playlist
+        # can, so playlists are always asked for their snapshot_id
+        keys = [
+            key
+            for key in keys
+            if record_kind(records[key].get("url")) == "playlist" or not unchanged(key)
+        ]
+        logging.info(f"{len(records) - len(keys)} records unchanged since last sync")
+
+    before = {key: dict(records[key]) for key in keys}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        fetched = fetch_metadata(sp, records, keys, executor)
+        snapshots = {key: fetched[key].get("snapshot_id") for key in fetched}
+        if cache is None:
+            changed = list(fetched)
+        else:
+            # a full run fetches everything, but only what Spotify actually
+            # changed counts, so an unchanged library is not written again
+            changed = [
+                key
+                for key in fetched
+                if records[key] != before[key] or not unchanged(key, snapshots[key])
+            ]
+        # a full run still checks every cover, the server only sends the
+        # ones that changed
+        covers = list(fetched) if full else changed
+        linked = download_images(records, covers, art, executor, workers)
+
+    art.make_thumbnails()
+    art.save()
+    if cache is not None:
+        # records without a cover are done once their details are in
+        coverless = [key for key in fetched if not records[key].get("image_url")]
+        for key in linked + coverless:
+            cache.update(key, records[key], snapshots[key])
+    logging.info(f"{len(changed)} of {len(records)} records changed")
+    return changed
 
 
 def main() -> None:
-    IMAGE_LOCATION = "./album_art/"
-    records_json = open("./records.json", "r")
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Refresh records from Spotify")
+    parser.add_argument(
+        "--full", action="store_true", help="refresh records the sync cache skips"
+    )
+    args = parser.parse_args()
 
-    records_dict = json.load(records_json)
+    # a store gets the refreshed records upserted, a JSON file is rewritten
+    store = RecordStore(RECORDS_PATH) if is_store_path(RECORDS_PATH) else None
+    if store is not None:
+        records_dict = {"records": store.records()}
+    else:
+        with open(RECORDS_PATH, "r") as records_json:
+            records_dict = json.load(records_json)
 
     # Initialize
     load_dotenv()
     SPOTIFY_USERNAME: int = int(os.environ.get("SPOTIFY_USERNAME"))  # type: ignore
-    sp, sp_auth, _ = spotipy_instance(username=SPOTIFY_USERNAME)
-
-    for key in records_dict["records"].keys():
-        item = records_dict["records"][key]
-
-        if "album" in item.get("url"):
-            details = sp.album(item.get("url"))
-            item["name"] = details["name"]
-            item["image_url"] = details["images"][0]["url"]
-            item["uri"] = details["uri"]
-        elif "playlist" in item.get("url"):
-            details = sp.playlist(item.get("url"))
-            item["name"] = details["name"]
-            item["image_url"] = details["images"][0]["url"]
-            item["uri"] = details["uri"]
-        else:
-            details = sp.track(item.get("url"))
-            item["name"] = details["name"]
-            item["image_url"] = details["album"]["images"][0]["url"]
-            item["uri"] = details["uri"]
-
-        # save images from url
-        filename = IMAGE_LOCATION + item["name"] + ".png"
-        r = requests.get(item["image_url"], stream=True)
-
-        if r.status_code == 200:
-            r.raw.decode_content = True
-            with open(filename, "wb") as f:
-                shutil.copyfileobj(r.raw, f)
-        else:
-            print("There was a problem.")
+    sp = SpotifyAuth(username=SPOTIFY_USERNAME).client()
+
+    records = records_dict["records"]
+    cache = SyncCache()
+    updated = refresh_records(sp, records, cache=cache, full=args.full)
+    cache.save()
 
-    # Now save updated record
-    with open("./records.json", "w") as outfile:
+    if store is not None:
+        store.upsert_many({key: records[key] for key in updated})
+        store.close()
+        return
+    if not updated:
+        # leave the file alone so running jukeboxes do not reload it
+        return
+    # Now save updated record, replacing the file in one step so a running
+    # jukebox never reloads a half written one
+    with open(RECORDS_PATH + ".tmp", "w") as outfile:
         json.dump(records_dict, outfile)
+    os.replace(RECORDS_PATH + ".tmp", RECORDS_PATH)
 
 
 if __name__ == "__main__":
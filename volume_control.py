@@ -1,5 +1,4 @@
 import logging
-import subprocess
 from signal import pause
 
 import RPi.GPIO as GPIO
@@ -7,19 +6,32 @@ import RPi.GPIO as GPIO
 rotary_logger = logging.getLogger("rotary_encoder")
 rotary_logger.setLevel(logging.WARNING)
 from rotary_encoder import RotaryEncoder
+from mixer import VolumeApplier, open_mixer
 
 
 class VolumeControl:
-    def __init__(self, MAX_VOLUME=65, MIN_VOLUME=15):
+    def __init__(
+        self, MAX_VOLUME=65, MIN_VOLUME=15, mixer=None, max_rate=25.0, hub=None
+    ):
+        """
+        Parameter mixer: a mixer.py backend, open_mixer() picks one by default.
+        Parameter max_rate: most mixer writes per second, see VolumeApplier.
+        Parameter hub: a gpio_hub.GpioHub to watch the encoder through.
+        """
         GPIO.setmode(GPIO.BOARD)
         self.MAX_VOLUME = MAX_VOLUME
         self.MIN_VOLUME = MIN_VOLUME
+        # opened once, every encoder step is a write to the same mixer
+        self.mixer = mixer if mixer is not None else open_mixer()
+        # encoder callbacks only move the target, the applier thread writes
+        self.applier = VolumeApplier(self.mixer, max_rate=max_rate)
         self.encoder = RotaryEncoder(
             pinA=37,
             pinB=11,
             functionCallDecr=self.decr_volume,
             functionCallIncr=self.incr_volume,
             timeBase=0.03,
+            hub=hub,
         )
         self.volume = 25
         self.set_volume(self.volume)
@@ -39,15 +51,12 @@ class VolumeControl:
         self.set_volume(self.volume)
 
     def set_volume(self, vol):
-        command = lambda vol: f"amixer -c IQaudIODAC sset 'Digital',0 {vol}%,{vol}% -M"
-        subprocess.run(
-            args=command(vol),
-            shell=True,
-            check=True,
-            capture_output=False,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        self.applier.set(vol)
+
+    def close(self) -> None:
+        """Stops the encoder, then applies the last volume and closes the mixer."""
+        self.encoder.stop()
+        self.applier.close()
 
 
 if __name__ == "__main__":